@@ -15,6 +15,8 @@ __all__ = [
     ]
 
 class AttributeReference:
+    __slots__ = ("component", "name")
+
     component: Type[Component]
     name: str
 
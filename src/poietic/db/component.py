@@ -3,7 +3,7 @@
 # Created by: Stefan Urbanek
 # Date: 2023-03-30
 #
-from typing import Type, Optional, TypeVar, cast, Protocol, Self, ClassVar, \
+from typing import Type, Optional, TypeVar, Protocol, Self, ClassVar, \
         Iterator
 from abc import abstractmethod
 
@@ -65,6 +65,8 @@ class ComponentSet:
 
     The component set stores one instance of a component per component type.
     """
+    __slots__ = ("_components",)
+
     _components: dict[Type[Component], Component]
 
     def __init__(self, components: Optional[list[Component]] = None):
@@ -88,7 +90,10 @@ class ComponentSet:
     def get(self, component_type: Type[C]) -> C:
         """Get a component of type `component_type`. Raises `KeyError` when the
         component is not present."""
-        return cast(C, self._components[component_type])
+        return self._components[component_type] # type: ignore
+
+    def __getitem__(self, component_type: Type[C]) -> C:
+        return self._components[component_type] # type: ignore
 
     def as_list(self) -> list[Component]:
         return list(self._components.values())
@@ -111,6 +116,9 @@ class ComponentSet:
         """Returns `true` when the component `component_type` is present."""
         return component_type in self._components
 
+    def __contains__(self, component_type: Type[Component]) -> bool:
+        return component_type in self._components
+
     def __str__(self) -> str:
         comp_list = ", ".join(str(key.__name__) for key in self._components.keys())
         return f"[{comp_list}]"
@@ -6,17 +6,19 @@
 # Date: 2023-04-17
 #
 
-from typing import Optional, cast, Iterable, Protocol
+from typing import Optional, cast, Iterable, Protocol, Callable, Type
 from abc import abstractmethod
+from operator import attrgetter
 
 from ..graph import Graph, Edge, Node, EdgeDirection
-from ..graph import NodePredicate, EdgePredicate
+from ..graph import NodePredicate, EdgePredicate, MatchFunction
 from ..value import ValueProtocol
 from ..attributes import AttributeReference
 
 from .identity import ObjectID
 from .object import ObjectSnapshot
 from .object_type import ObjectType 
+from .component import Component
 
 
 """
@@ -42,6 +44,7 @@ class ConstraintViolation:
     The structure contains a list of nodes and edges that violated the
     constraint.
     """
+    __slots__ = ("constraint", "nodes", "edges")
 
     """Constraint that was violated and produced this violation."""
     constraint: "Constraint"
@@ -53,6 +56,14 @@ class ConstraintViolation:
     
     edges: list[ObjectID]
 
+    def __init__(self,
+                 constraint: "Constraint",
+                 nodes: Optional[list[ObjectID]] = None,
+                 edges: Optional[list[ObjectID]] = None):
+        self.constraint = constraint
+        self.nodes = nodes or list()
+        self.edges = edges or list()
+
     """Human-readable description of the violation."""
     def __str__(self) -> str:
         nodes = ", ".join(str(node) for node in self.nodes)
@@ -68,6 +79,7 @@ class Constraint:
     selected by the predicate that do not satisfy the requirement are
     constraint violators.
     """
+    __slots__ = ("name", "description")
 
     name: str
     """An identifier of the constraint. Should be unique within set of
@@ -80,12 +92,17 @@ class Constraint:
 
 
 class NodeConstraint(Constraint):
+    __slots__ = ("predicate", "requirement", "_match")
+
     match: NodePredicate
     """Predicate that matches the objects to be verified by the constraint."""
 
     requirement: "NodeConstraintRequirement"
     """Requirement that the matched objects must satisfy."""
 
+    _match: MatchFunction
+    """Compiled predicate."""
+
     def __init__(self,
                  name: str,
                  description: str,
@@ -95,10 +112,21 @@ class NodeConstraint(Constraint):
         self.description = description
         self.predicate = predicate
         self.requirement = requirement
+        self._match = predicate.compile_node()
 
     @abstractmethod
     def check(self, graph: Graph) -> list[ObjectID]:
-        matching = graph.select_nodes(self.predicate)
+        match = self._match
+        matching: Iterable[Node]
+
+        # Matching nodes are streamed to the requirement, requirements that
+        # need more passes collect them themselves.
+        if (object_type := self.predicate.required_type()) is not None:
+            candidates = graph.nodes_by_type(object_type)
+        else:
+            candidates = graph.nodes()
+        matching = (node for node in candidates if match(graph, node))
+
         violating = self.requirement.check_nodes(graph, matching)
         return violating
 
@@ -109,6 +137,8 @@ class NodeConstraintRequirement(Protocol):
     Constraint requirement is checked on all objets selected by the constraint
     predicate.
     """
+    __slots__ = ()
+
     def check_nodes(self, graph: Graph, nodes: Iterable[Node]) -> list[Node]:
         """
         Check the given objects within the given graph and return a list of
@@ -123,6 +153,8 @@ class ObjectConstraintRequirement(NodeConstraintRequirement, Protocol):
     Constraint requirement is checked on all objets selected by the constraint
     predicate.
     """
+    __slots__ = ()
+
     def check(self, graph: Graph, objects: Iterable[ObjectSnapshot]) -> list[ObjectSnapshot]:
         """
         Check the given objects within the given graph and return a list of
@@ -138,6 +170,8 @@ class ObjectConstraintRequirement(NodeConstraintRequirement, Protocol):
         return cast(list[Edge], self.check(graph=graph, objects=edges))
 
 class UniqueNeighborRequirement(NodeConstraintRequirement):
+    __slots__ = ("predicate", "direction")
+
     predicate: EdgePredicate
     direction: EdgeDirection
 
@@ -157,6 +191,8 @@ class EdgeConstraintRequirement:
     Constraint requirement is checked on all objets selected by the constraint
     predicate.
     """
+    __slots__ = ()
+
     @abstractmethod
     def check(self, graph: Graph, objects: list[Edge]) -> list[Edge]:
         """
@@ -170,38 +206,48 @@ class EdgeConstraintRequirement:
 class AcceptAll(EdgeConstraintRequirement):
     """Requirement that satisfies all objects - used as a placeholder or for
     testing purposes. This requirement does not have much practical use."""
+    __slots__ = ()
+
     def check(self, graph: Graph, objects: list[Edge]) -> list[Edge]:
         return list()
 
 
 class UniqueAttribute(ObjectConstraintRequirement):
+    __slots__ = ("attribute", "_component_type", "_get_value")
+
     attribute: AttributeReference
 
+    _component_type: Type[Component]
+    _get_value: Callable[[Component], ValueProtocol]
+
     def __init__(self, attribute: AttributeReference):
         self.attribute = attribute
+        self._component_type = attribute.component
+        self._get_value = attrgetter(attribute.name)
 
     def check(self, graph: Graph, objects: list[Edge]) -> list[Edge]:
-        seen: dict[ValueProtocol, list[Edge]] = dict()
+        # Most values are expected to be unique, so the first occurrence is
+        # stored without a list. A list is created only for duplicates.
+        seen_once: dict[ValueProtocol, Edge] = dict()
+        dupes: dict[ValueProtocol, list[Edge]] = dict()
+        component_type = self._component_type
+        get_value = self._get_value
 
         for object in objects:
-            component = object[self.attribute.component]
-            value = getattr(component, self.attribute.name)
-
-            if value not in seen:
-                seen[value] = [object]
+            value = get_value(object[component_type])
+            if value in dupes:
+                dupes[value].append(object)
+            elif value in seen_once:
+                dupes[value] = [seen_once.pop(value), object]
             else:
-                seen[value].append(object)
-
-        dupes: list[Edge] = list()
-        for ids in seen.values():
-            if len(ids) > 1:
-                dupes += ids
+                seen_once[value] = object
 
-        return dupes
+        return [object for group in dupes.values() for object in group]
 
 
 class EdgeEndpointType(EdgeConstraintRequirement):
     """Constraint requirement for edge and its endpoints."""
+    __slots__ = ("edge_type", "origin_type", "target_type")
 
     # TODO: Change to Union[None, ObjectType, list[ObjectType]]
     edge_type: Optional[ObjectType]
@@ -230,24 +276,25 @@ class EdgeEndpointType(EdgeConstraintRequirement):
     def check(self,
               graph: Graph,
               objects: list[Edge]) -> list[Edge]:
-        violators: list[Edge] = list()
-
-        for edge in objects:
-            assert isinstance(edge, Edge), \
-                    f"Expected edge, got: {edge}"
-
-            edge = cast(Edge, edge)
-
-            origin: Node = graph.node(edge.origin)
-            target: Node = graph.node(edge.target)
-            if (origin_type := self.origin_type):
-                if origin.type is not origin_type:
-                    violators.append(edge)
-                    continue
-
-            if (target_type := self.target_type):
-                if target.type is not target_type:
-                    violators.append(edge)
-                    continue
-
-        return violators
+        objects = list(objects)
+
+        # Single bulk check, stripped together with other asserts under -O
+        assert all(isinstance(edge, Edge) for edge in objects), \
+                "Expected only edges"
+
+        # Masks of required types, zero when there is no requirement
+        origin_required = self.origin_type.mask if self.origin_type else 0
+        target_required = self.target_type.mask if self.target_type else 0
+
+        # Type masks are fetched only for the endpoints with a requirement
+        count = len(objects)
+        origin_masks = (graph.type_masks_of([edge.origin for edge in objects])
+                        if origin_required else [0] * count)
+        target_masks = (graph.type_masks_of([edge.target for edge in objects])
+                        if target_required else [0] * count)
+
+        return [edge
+                for edge, origin, target
+                in zip(objects, origin_masks, target_masks)
+                if (origin_required and not origin & origin_required)
+                or (target_required and not target & target_required)]
@@ -6,7 +6,9 @@
 
 # FIXME: Rename the file/module to `memory`
 
-from typing import Optional, Iterable, Type, cast
+from typing import Optional, Iterable, KeysView, Type, cast
+from array import array
+from concurrent.futures import Executor
 
 from ..persistence.store import \
         PersistentStore, \
@@ -14,7 +16,7 @@ from ..persistence.store import \
         ExtendedPersistentRecord
 
 from ..metamodel import MetamodelBase
-from ..graph import Node, Edge
+from ..graph import Node, Edge, BoundGraph
 
 from .frame import StableFrame
 from .component import PersistableComponent
@@ -30,6 +32,14 @@ __all__ = [
 ]
 
 
+_SNAPSHOT_FROM_RECORD = {
+    "node": Node.from_record,
+    "edge": Edge.from_record,
+}
+"""Functions creating snapshots from persistent records by the structural
+type name of the snapshot."""
+
+
 # TODO: Validate whether objects have required components according to
 # the metamodel
 class ObjectMemory:
@@ -40,6 +50,24 @@ class ObjectMemory:
     # TODO: All access to *_id_generator should be atomic
     # TODO: [IMPORTANT] Separate all history related functionality.
 
+    __slots__ = (
+        "identity_generator",
+        "_stable_frames",
+        "_mutable_frames",
+        "_all_versions",
+        "_object_versions",
+        "_snapshots_by_id",
+        "_snapshot_refcount",
+        "version_history",
+        "_history_positions",
+        "_current_version_index",
+        "_current_version",
+        "_current_frame",
+        "metamodel",
+        "_constraint_cache",
+        "_graph_cache",
+    )
+
     identity_generator: SequentialIDGenerator
     """
     Generator for identifiers of persistent objects: objects, frames,
@@ -58,25 +86,60 @@ class ObjectMemory:
     _stable_frames: dict[VersionID,StableFrame]
     _mutable_frames: dict[VersionID,MutableFrame]
 
+    _all_versions: set[VersionID]
+    """Versions of both stable and mutable frames."""
+
+    _object_versions: dict[ObjectID, list[VersionID]]
+    """Versions of stable frames that contain an object, in the order in
+    which the frames were accepted."""
+
+    _snapshots_by_id: dict[SnapshotID, ObjectSnapshot]
+    """Snapshots contained in stable frames, each stored only once."""
+
+    _snapshot_refcount: dict[SnapshotID, int]
+    """Number of stable frames that contain a snapshot."""
+
     # History management
     # TODO: Separate this functionality
     version_history: list[VersionID]
     """List of versions in chronological order."""
 
-    current_version_index: Optional[int]
+    _history_positions: dict[VersionID, int]
+    """Positions of versions in the `version_history`."""
+
+    _current_version_index: Optional[int]
+
+    _current_version: Optional[VersionID]
+    """Cached current version. Invalidated when the current version index
+    changes or the history is replaced."""
+
+    _current_frame: Optional[StableFrame]
+    """Cached current frame. Invalidated together with the current
+    version."""
 
 
     metamodel: Optional[Type[MetamodelBase]]
 
+    _constraint_cache: dict[tuple[VersionID, str], Optional[ConstraintViolation]]
+    """Results of constraint checks by frame version and constraint name.
+    Stable frames are immutable, therefore the results are valid until the
+    frame is removed."""
+
+    _graph_cache: Optional[tuple[VersionID, BoundGraph]]
+    """Graph of the most recently checked frame, shared by constraint
+    checks."""
+
     
     @property
-    def all_versions(self) -> list[VersionID]:
+    def all_versions(self) -> KeysView[VersionID]:
         """
-        List of all frame versions present in the database.
+        Collection of all frame versions present in the database.
 
-        The order is arbitrary and nothings should be inferred from it.
+        The order is arbitrary and nothings should be inferred from it. The
+        collection is a live view, make a list of it if the frames are going
+        to be removed while iterating.
         """
-        return list(self._stable_frames.keys())
+        return self._stable_frames.keys()
     
     def __init__(self,
                  metamodel: Optional[Type[MetamodelBase]]=None,
@@ -87,12 +150,21 @@ class ObjectMemory:
         `store` is a persistent store from which the design will be loaded. If
         not provided an empty design will be created.
         """
-        self._stable_frames = dict()
-        self._mutable_frames = dict()
-        self.version_history = list()
-        self.current_version_index = None
+        self._stable_frames = {}
+        self._mutable_frames = {}
+        self._all_versions = set()
+        self._object_versions = {}
+        self._snapshots_by_id = {}
+        self._snapshot_refcount = {}
+        self.version_history = []
+        self._history_positions = {}
+        self._current_version_index = None
+        self._current_version = None
+        self._current_frame = None
         self.identity_generator = SequentialIDGenerator()
         self.metamodel = metamodel
+        self._constraint_cache = {}
+        self._graph_cache = None
 
 
         if store is not None:
@@ -129,19 +201,19 @@ class ObjectMemory:
         # 1. Load and create all snapshots
         # -------------------------------------------------------------------
 
+        # Bound methods used for every record
+        type_by_name = metamodel.type_by_name
+        from_record_for = _SNAPSHOT_FROM_RECORD.get
+
         for record in store.read_extended_records("snapshots"):
             type_name = cast(str, record["type"])
-            object_type = metamodel.type_by_name(type_name)
+            object_type = type_by_name(type_name)
             structural_type = object_type.structural_type_name
 
-            match structural_type:
-                case "node": 
-                    snapshot = Node.from_record(metamodel=metamodel,
-                                                record=record)
-                case "edge":
-                    snapshot = Edge.from_record(metamodel=metamodel,
-                                                record=record)
-                case _: raise Exception(f"Unknown structural type: {structural_type}")
+            from_record = from_record_for(structural_type)
+            if from_record is None:
+                raise Exception(f"Unknown structural type: {structural_type}")
+            snapshot = from_record(metamodel=metamodel, record=record)
 
             # All persisted snapshots are frozen snapshots and can not be
             # mutated any further.
@@ -156,12 +228,12 @@ class ObjectMemory:
             ids: list[VersionID] = cast(list[int], record["snapshots"]) 
 
             frame = self.create_frame(version=frame_id)
+            insert = frame.insert
         
             for id in ids:
-                snapshot = snapshots[id]
                 # We insert a snapshot to the frame and make it non-owned. The
                 # frame will be closed immediately and made stable (not-mutable)
-                frame.insert(snapshot, owned=False)
+                insert(snapshots[id], owned=False)
 
             self.accept(frame)
 
@@ -179,6 +251,10 @@ class ObjectMemory:
         else:
             # TODO: Issue a warning that we are missing history.
             self.version_history = list()
+
+        self._history_positions = {version: index for index, version
+                                   in enumerate(self.version_history)}
+        self._invalidate_current()
             
 
     def save(self, store: PersistentStore):
@@ -206,26 +282,19 @@ class ObjectMemory:
 
         # What we are going to store:
 
-        snapshots: list[ExtendedPersistentRecord] = list()
-        frames: list[ExtendedPersistentRecord] = list()
+        # Records of snapshots and frames are streamed to the store, one
+        # record at a time.
         framesets: list[ExtendedPersistentRecord] = list()
 
         # 1. Write Snapshots
         # -------------------------------------------------------------------
 
-        for obj in self.snapshots:
-            record = obj.persistent_record()
-            snapshots.append(record)
+        snapshots = (obj.persistent_record() for obj in self.snapshots)
 
         # 2. Write Frames
         # -------------------------------------------------------------------
 
-        for frame in self.frames:
-            ids: list[SnapshotID] = list(obj.snapshot_id for obj in frame.snapshots)
-            frame_record = ExtendedPersistentRecord()
-            frame_record["frame_id"] = frame.version
-            frame_record["snapshots"] = ids
-            frames.append(frame_record)
+        frames = (self._frame_record(frame) for frame in self.frames)
 
 
         # 3. Write Framesets
@@ -238,9 +307,9 @@ class ObjectMemory:
 
         # Final: Write Framesets
         # -------------------------------------------------------------------
-        store.write_extended_records("snapshots", snapshots)
-        store.write_extended_records("frames", frames)
-        store.write_extended_records("framesets", framesets)
+        store.write_extended_record_batch([("snapshots", snapshots),
+                                           ("frames", frames),
+                                           ("framesets", framesets)])
 
 
         # Here the store is expected to have:
@@ -252,6 +321,17 @@ class ObjectMemory:
         store.close()
 
 
+    @staticmethod
+    def _frame_record(frame: StableFrame) -> ExtendedPersistentRecord:
+        """Create a persistent record of a frame, referencing its
+        snapshots."""
+        # Packed array of IDs, frames might reference many snapshots
+        ids = array("q", [obj.snapshot_id for obj in frame.snapshots])
+        record = ExtendedPersistentRecord()
+        record["frame_id"] = frame.version
+        record["snapshots"] = ids
+        return record
+
     def clear(self):
         """Clearsthe whole memory, removing all objects.
 
@@ -278,51 +358,62 @@ class ObjectMemory:
 
     @property
     def snapshots(self) -> Iterable[ObjectSnapshot]:
-        """All snapshots contained in stable frames of the memory."""
-        seen: set[SnapshotID] = set()
-        for frame in self._stable_frames.values():
-            for snapshot in frame.snapshots:
-                if snapshot.id in seen:
-                    continue
-                seen.add(snapshot.id)
-                yield snapshot
+        """All snapshots contained in stable frames of the memory. Each
+        snapshot is included only once, even if it is shared by multiple
+        frames."""
+        return self._snapshots_by_id.values()
+
+    @property
+    def current_version_index(self) -> Optional[int]:
+        """Index of the current version in the `version_history`."""
+        return self._current_version_index
+
+    @current_version_index.setter
+    def current_version_index(self, index: Optional[int]):
+        self._current_version_index = index
+        self._invalidate_current()
+
+    def _invalidate_current(self):
+        """Discard the cached current version and frame."""
+        self._current_version = None
+        self._current_frame = None
 
     @property
     def current_version(self) -> VersionID:
         """
         Version identifier of the latest state in the history of versions.
         """
-        if (index := self.current_version_index) is None:
+        if (version := self._current_version) is not None:
+            return version
+        if (index := self._current_version_index) is None:
             raise RuntimeError("Memory has no history (no current version index)")
         if not self.version_history:
             raise RuntimeError("Version history is empty (should not be)")
         try:
-            return self.version_history[index]
+            version = self.version_history[index]
         except IndexError:
             raise RuntimeError("Invalid current version index")
+        self._current_version = version
+        return version
     
     
     @property
     def current_frame(self) -> StableFrame:
         """Get current version frame from the version history."""
-        return self.frame(self.current_version)
+        if (frame := self._current_frame) is None:
+            frame = self.frame(self.current_version)
+            self._current_frame = frame
+        return frame
     
 
     def contains_version(self, version: VersionID) -> bool:
         """Returns `true` if the memory contains a frame (stable or mutable) with given
         version."""
-        return version in self._stable_frames \
-                or version in self._mutable_frames
+        return version in self._all_versions
        
     def versions(self, id: ObjectID) -> list[VersionID]:
         """Return list of stable versions of an object with given ID."""
-        versions: list[VersionID] = list()
-
-        for frame in self._stable_frames.values():
-            if frame.contains(id):
-                versions.append(frame.version)
-
-        return versions
+        return list(self._object_versions.get(id, ()))
 
     
     def create_frame(self, version: Optional[VersionID] = None) -> MutableFrame:
@@ -342,22 +433,28 @@ class ObjectMemory:
             frame is a very unique operation. This method is used by the
             database to create the very first frame.
         """
-
-        actual_version: VersionID
-
-        if version is not None:
-            assert not self.contains_version(version)
-            self.identity_generator.mark_used(version)
-            actual_version = version
-        else:
-            actual_version = self.identity_generator.next()
+        actual_version = self._allocate_version(version)
 
         frame = MutableFrame(memory=self,
                              version=actual_version)
         self._mutable_frames[actual_version] = frame
+        self._all_versions.add(actual_version)
 
         return frame
 
+    def _allocate_version(self, version: Optional[VersionID]) -> VersionID:
+        """Get a version for a new frame: `version` if provided, otherwise a
+        new version ID. A new version ID is the common case and it is
+        checked first.
+
+        - Precondition: Memory must not contain `version`.
+        """
+        if version is None:
+            return self.identity_generator.next()
+
+        assert not self.contains_version(version)
+        self.identity_generator.mark_used(version)
+        return version
     
     def derive_frame(self,
                      original_version: Optional[VersionID] = None,
@@ -377,45 +474,79 @@ class ObjectMemory:
         # TODO: [IMPORTANT] Remove history related functionality - using
         # "current version" for original; make original required.
 
-        actual_version: VersionID
-        actual_original_version: VersionID
+        original: StableFrame
 
-        if original_version is not None:
-            assert self.contains_version(original_version)
-            actual_original_version = original_version
+        if original_version is None:
+            original = self.current_frame
         else:
-            actual_original_version = self.current_version
-
-
-        if version is not None:
-            assert not self.contains_version(version)
-            self.identity_generator.mark_used(version)
-            actual_version = version
-        else:
-            actual_version = self.identity_generator.next()
+            assert self.contains_version(original_version)
+            original = self._stable_frames[original_version]
 
-        original = self._stable_frames[actual_original_version]
+        actual_version = self._allocate_version(version)
 
         derived = MutableFrame(memory=self,
                                version=actual_version,
-                               objects=original.snapshots)
+                               original=original)
         self._mutable_frames[actual_version] = derived
+        self._all_versions.add(actual_version)
         
         return derived
 
     
     def remove_frame(self, version: VersionID):
-        """Remove a frame `version` from the storage."""
-
-        # TODO: Garbage collect objects
+        """Remove a frame `version` from the storage.
 
+        Snapshots that are no longer contained in any stable frame are
+        released by the memory.
+        """
         if version in self._stable_frames:
-            del self._stable_frames[version]
+            self._remove_stable_frames([version])
         elif version in self._mutable_frames:
             del self._mutable_frames[version]
+            self._all_versions.discard(version)
         else:
             raise RuntimeError(f"Unknown frame: {version}")
 
+    def _remove_stable_frames(self, versions: list[VersionID]):
+        """Remove stable frames with given versions and all the information
+        associated with them in a single pass.
+
+        The history is not modified, the caller is responsible for removing
+        the versions from the history.
+        """
+        removed = set(versions)
+        affected: set[ObjectID] = set()
+
+        refcount = self._snapshot_refcount
+
+        for version in versions:
+            frame = self._stable_frames.pop(version)
+            affected.update(frame.object_ids)
+            for snapshot in frame.snapshots:
+                snapshot_id = snapshot.snapshot_id
+                refcount[snapshot_id] -= 1
+                if not refcount[snapshot_id]:
+                    del refcount[snapshot_id]
+                    del self._snapshots_by_id[snapshot_id]
+
+        for id in affected:
+            remaining = [version for version in self._object_versions[id]
+                         if version not in removed]
+            if remaining:
+                self._object_versions[id] = remaining
+            else:
+                del self._object_versions[id]
+
+        for key in [key for key in self._constraint_cache
+                    if key[0] in removed]:
+            del self._constraint_cache[key]
+
+        self._all_versions -= removed
+        if self._current_version in removed:
+            self._invalidate_current()
+        if self._graph_cache is not None and self._graph_cache[0] in removed:
+            self._graph_cache = None
+
 
     def accept(self, frame: MutableFrame, append_history: bool = True):
         """Commit an open transaction and push the frame version into the
@@ -434,37 +565,50 @@ class ObjectMemory:
         
         # Validate integrity
 
-        missing_objects: list[ObjectID] = list()
-        for obj in frame.derived_objects:
-            missing_objects += (dep for dep in obj.structural_dependencies()
-                                if not frame.contains(dep))
-
-        if missing_objects:
-            raise RuntimeError("Unhandled integrity violation: missing structural dependencies")
+        if (violation := frame.integrity_violation()) is not None:
+            (id, dep) = violation
+            raise RuntimeError(f"Unhandled integrity violation: missing structural dependency {dep} of object {id}")
 
         # We need to freeze the mutable frame before we can derive a stable
         # frame.
         frame.freeze()
 
         stable_frame = StableFrame(version=frame.version,
-                                   objects=frame.snapshots)
+                                   snapshots=frame.snapshot_dict())
 
 
-        if not frame.has_referential_integrity:
-            raise RuntimeError(f"Referential integrity violated (frame: {frame.version})")
-
         self._stable_frames[frame.version] = stable_frame
         del self._mutable_frames[frame.version]
 
+        object_versions = self._object_versions
+        snapshots_by_id = self._snapshots_by_id
+        refcount = self._snapshot_refcount
+        for snapshot in stable_frame.snapshots:
+            object_versions.setdefault(snapshot.id, []).append(frame.version)
+            snapshot_id = snapshot.snapshot_id
+            if snapshot_id in refcount:
+                refcount[snapshot_id] += 1
+            else:
+                refcount[snapshot_id] = 1
+                snapshots_by_id[snapshot_id] = snapshot
+
         # History management
         if append_history:
             if self.current_version_index is not None:
                 if self.version_history:
-                    # Delete "redo" history
-                    del self.version_history[self.current_version_index + 1:]
+                    # Delete "redo" history together with its frames, they
+                    # are no longer reachable.
+                    redo_start = self.current_version_index + 1
+                    redo_tail = self.version_history[redo_start:]
+                    for version in redo_tail:
+                        del self._history_positions[version]
+                    del self.version_history[redo_start:]
+                    if redo_tail:
+                        self._remove_stable_frames(redo_tail)
                 self.current_version_index += 1
             else:
                 self.current_version_index = 0
+            self._history_positions[frame.version] = len(self.version_history)
             self.version_history.append(frame.version)
 
 
@@ -480,7 +624,9 @@ class ObjectMemory:
 
         frame.freeze()
         del self._mutable_frames[frame.version]
-        # TODO: Garbage collect objetcs
+        self._all_versions.discard(frame.version)
+        # Snapshots created in the frame are referenced only by the frame,
+        # they are not registered with the memory until accepted.
 
 
     # History undo/redo
@@ -489,16 +635,16 @@ class ObjectMemory:
     @property
     def undoable_versions(self) -> list[VersionID]:
         """List of versions that can be undone."""
-        if self.current_version_index is not None:
-            return self.version_history[0:self.current_version_index+1]
+        if (index := self._current_version_index) is not None:
+            return self.version_history[:index + 1]
         else:
             return []
 
     @property
     def redoable_versions(self) -> list[VersionID]:
         """List of versions that can be redone."""
-        if self.current_version_index is not None:
-            return self.version_history[self.current_version_index+1:]
+        if (index := self._current_version_index) is not None:
+            return self.version_history[index + 1:]
         else:
             return []
 
@@ -515,12 +661,9 @@ class ObjectMemory:
 
         """
     
-        # Get the index of the version we would like to undo to. We search
-        # from the end of the version list.
-        #
         try:
-            index = self.version_history.index(version)
-        except:
+            index = self._history_positions[version]
+        except KeyError:
             raise RuntimeError(f"Trying to reset to version '{version}', which does not exist in the history")
 
         self.current_version_index = index
@@ -538,8 +681,8 @@ class ObjectMemory:
           otherwise it is considered a programming error.
         """
         try:
-            index = self.version_history.index(version)
-        except:
+            index = self._history_positions[version]
+        except KeyError:
             raise RuntimeError(f"Trying to redo to version '{version}', which does not exist in the history")
 
         self.current_version_index = index
@@ -548,20 +691,80 @@ class ObjectMemory:
     # Constraints
     # --------------------------------------------------------
 
-    def check_constraints(self, constraints: list[Constraint]) -> list[ConstraintViolation]:
-        violations: list[ConstraintViolation] = list()
+    def check_constraints(self,
+                          constraints: list[Constraint],
+                          executor: Optional[Executor] = None) -> list[ConstraintViolation]:
+        """Check constraints on the current frame and return a list of
+        violations, in the order of the constraints.
+
+        Checks only read the immutable current frame. If an `executor` is
+        provided, such as a thread pool owned by the caller, the constraints
+        are checked through it. Otherwise they are checked sequentially.
+
+        .. note::
+
+            The checks are pure Python code, threads do not speed them up
+            unless the interpreter runs without the global interpreter lock.
+        """
+        results: Iterable[Optional[ConstraintViolation]]
+
+        # Build the shared graph before the checks might run in threads
+        self._frame_graph(self.current_frame)
 
-        for constraint in constraints:
-            if (violation := self.check_constraint(constraint)):
-                violations.append(violation)
+        if executor is not None:
+            results = executor.map(self.check_constraint, constraints)
+        else:
+            results = (self.check_constraint(constraint)
+                       for constraint in constraints)
 
-        return violations
+        return [violation for violation in results if violation is not None]
 
     def check_constraint(self, constraint: Constraint) -> Optional[ConstraintViolation]:
-        raise NotImplementedError
+        """Check a constraint on the current frame.
+
+        :return: Constraint violation or `None` if the current frame
+            satisfies the constraint.
+
+        Results are cached by the frame version and the constraint name,
+        therefore constraint names must be unique.
+        """
+        key = (self.current_version, constraint.name)
+        try:
+            return self._constraint_cache[key]
+        except KeyError:
+            pass
+
+        graph = self._frame_graph(self.current_frame)
+        violators = constraint.check(graph)
+
+        result: Optional[ConstraintViolation]
+        if violators:
+            result = ConstraintViolation(
+                    constraint,
+                    nodes=[obj.id for obj in violators
+                           if graph.contains_node(obj.id)],
+                    edges=[obj.id for obj in violators
+                           if graph.contains_edge(obj.id)])
+        else:
+            result = None
+
+        self._constraint_cache[key] = result
+        return result
+
+    def _frame_graph(self, frame: StableFrame) -> BoundGraph:
+        """Get a graph of a stable frame. The graph of the last requested
+        frame is kept, since stable frames do not change."""
+        if (cached := self._graph_cache) is not None \
+                and cached[0] == frame.version:
+            return cached[1]
+        graph = BoundGraph(frame)
+        self._graph_cache = (frame.version, graph)
+        return graph
 
 
-# TODO: [IMPORTANT] Garbage collection of unused versions of graph objects (nodes/edges)
+# NOTE: Snapshots are reference counted by the stable frames that contain
+# them, see `_snapshot_refcount`. A snapshot is released when its last frame
+# is removed.
 
 # FIXME: change to HistoryManager and associate the memory with it.
 # class HistoryManager:
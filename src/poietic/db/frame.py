@@ -6,13 +6,15 @@
 
 # TODO: IMPORTANT: .object(id) should raise IdentityError
 
-from typing import Optional, Iterator, TYPE_CHECKING, Protocol
+from typing import Optional, Iterator, Iterable, TYPE_CHECKING, Protocol, Type
+from typing import Collection, Mapping
 
 from ..errors import IDError
 
 from .version import VersionState
 from .object import ObjectSnapshot
 from .identity import ObjectID, VersionID
+from .component import Component
 
 
 __all__ = [
@@ -21,18 +23,62 @@ __all__ = [
 ]
 
 
+ComponentIndex = dict[Type[Component], list[ObjectID]]
+"""Mapping of component types to objects that have a component of that
+type. The objects are in the order of the frame snapshots."""
+
+
+DependencyIndex = dict[ObjectID, list[ObjectID]]
+"""Mapping of object IDs to objects that structurally depend on them."""
+
+
+def make_dependency_index(snapshots: Iterable[ObjectSnapshot]) -> DependencyIndex:
+    """Create an index of objects by their structural dependencies."""
+    index: DependencyIndex = dict()
+
+    for snapshot in snapshots:
+        for dep in snapshot.structural_dependencies():
+            index.setdefault(dep, list()).append(snapshot.id)
+
+    return index
+
+
+def make_component_index(snapshots: Iterable[ObjectSnapshot]) -> ComponentIndex:
+    """Create an index of objects by their component types."""
+    index: ComponentIndex = dict()
+
+    for snapshot in snapshots:
+        for component_type in snapshot.components._components:
+            index.setdefault(component_type, list()).append(snapshot.id)
+
+    return index
+
+
 class FrameBase(Protocol):
     @property
-    def snapshots(self) -> Iterator[ObjectSnapshot]:
+    def snapshots(self) -> Collection[ObjectSnapshot]:
         ...
 
     def contains(self, id: ObjectID) -> bool:
         ...
 
+    @property
+    def object_ids(self) -> Collection[ObjectID]:
+        """Collection of IDs of objects in the frame, for bulk membership
+        tests."""
+        return set(snapshot.id for snapshot in self.snapshots)
+
     def object(self, id: ObjectID) -> ObjectSnapshot:
         ...
 
-    def structural_dependants(self, id: ObjectID) -> Iterator[ObjectID]:
+    def objects_with_component(self,
+                               component_type: Type[Component]) -> Iterable[ObjectID]:
+        """Get IDs of objects that have a component of type
+        `component_type`."""
+        return (snapshot.id for snapshot in self.snapshots
+                if component_type in snapshot.components)
+
+    def structural_dependants(self, id: ObjectID) -> Iterable[ObjectID]:
         """
         Find all objects that depend on the object with `id`. For example,
         edges depend on their endpoints.
@@ -50,7 +96,7 @@ class FrameBase(Protocol):
         """Returns `true` if the frame maintains referential integrity of
         structural objects."""
 
-        return next(self.referential_integrity_violators()) == None
+        return next(self.referential_integrity_violators(), None) is None
 
 
     def referential_integrity_violators(self) -> Iterator[ObjectID]:
@@ -60,11 +106,15 @@ class FrameBase(Protocol):
         For example, if the frame is representing a graph and endpoints of the
         edges of the graph refer to objects that do not exist in the frame."""
 
+        # Membership is tested through the bound method of the ID collection
+        # which is evaluated by `map()` without a Python-level loop per
+        # dependency.
+        contains = self.object_ids.__contains__
+
         for snapshot in self.snapshots:
-            for id in snapshot.structural_dependencies():
-                if not self.contains(id):
-                    yield snapshot.id
-                    break
+            deps = snapshot.structural_dependencies()
+            if deps and not all(map(contains, deps)):
+                yield snapshot.id
     
 
 class StableFrame(FrameBase):
@@ -81,36 +131,76 @@ class StableFrame(FrameBase):
     """
     
     # check for mutability
-    _snapshots: dict[ObjectID, ObjectSnapshot]
+    _snapshots: Mapping[ObjectID, ObjectSnapshot]
+
+    _component_index: Optional[ComponentIndex]
+    """Index of objects by component types. Created on first use, the frame
+    is immutable therefore the index is never invalidated."""
+
+    _dependency_index: Optional[DependencyIndex]
+    """Index of objects by their structural dependencies. Created on first
+    use and shared by frames derived from this frame."""
     
     def __init__(self, version: VersionID,
-                 objects: Optional[Iterator[ObjectSnapshot]] = None):
+                 objects: Optional[Iterator[ObjectSnapshot]] = None,
+                 snapshots: Optional[Mapping[ObjectID, ObjectSnapshot]] = None):
         """Create a new version frame for a version `version`.
 
         :param VersionID version: Version ID of the new frame. It must be unique within the database.
         :param dict[ObjectID, ObjectSnapshot] objetcs: optional dictionary of objects that will be associated with this frame.
+        :param dict[ObjectID, ObjectSnapshot] snapshots: optional dictionary
+            of frozen snapshots. The dictionary is used without copying
+            and might be shared with other stable frames, it must not be
+            modified afterwards.
         """
         self.version = version
         self.state = VersionState.UNSTABLE
-        self._snapshots = dict()
         self._snapshot_ids = set()
+        self._component_index = None
+        self._dependency_index = None
 
-        if objects is not None:
-            for obj in objects:
-                if obj.state.is_mutable:
+        if snapshots is None:
+            if objects is not None:
+                snapshots = {obj.id: obj for obj in objects}
+                if any(obj.state.is_mutable for obj in snapshots.values()):
                     raise RuntimeError("Trying to create a stable frame with a mutable object snapshot.")
-                self._snapshots[obj.id] = obj
+            else:
+                snapshots = dict()
+
+        self._snapshots = snapshots
     
     @property
-    def snapshots(self) -> Iterator[ObjectSnapshot]:
-        """Get a sequence of all snapshots within the frame."""
-        return iter(self._snapshots.values())
+    def snapshots(self) -> Collection[ObjectSnapshot]:
+        """Get a collection of all snapshots within the frame. The collection
+        is a live view of the frame."""
+        return self._snapshots.values()
 
     
     def contains(self, id: ObjectID) -> bool:
         """:return: `True` if the frame constains objects with object identity `id`."""
         return id in self._snapshots
 
+    @property
+    def object_ids(self) -> Collection[ObjectID]:
+        """Collection of IDs of objects in the frame, for bulk membership
+        tests."""
+        return self._snapshots.keys()
+
+    def objects_with_component(self,
+                               component_type: Type[Component]) -> Iterable[ObjectID]:
+        """Get IDs of objects that have a component of type
+        `component_type`."""
+        if self._component_index is None:
+            self._component_index = make_component_index(self.snapshots)
+        return self._component_index.get(component_type, ())
+
+
+    def structural_dependants(self, id: ObjectID) -> Iterable[ObjectID]:
+        """Get objects that depend on the object with `id`, using an index
+        created on first use."""
+        if self._dependency_index is None:
+            self._dependency_index = make_dependency_index(self.snapshots)
+        return self._dependency_index.get(id, ())
 
     def object(self, id: ObjectID) -> ObjectSnapshot:
         """
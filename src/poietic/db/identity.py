@@ -4,6 +4,7 @@
 # Date: 2023-03-30
 
 from typing import TypeAlias, Any, Optional
+from threading import Lock
 
 __all__ = [
     "ID",
@@ -38,9 +39,16 @@ class SequentialIDGenerator:
 
     This class is used to assign an identity to objects, snapshots and
     versions.
+
+    The generator is thread-safe: `next()` and `mark_used()` update the
+    sequence atomically.
     """
 
-    _current: ID
+    _next: ID
+    """Identity that will be generated next."""
+
+    _lock: Lock
+    """Lock guarding updates of the next identity."""
 
     def __init__(self, state: Optional[str] = None):
         """Create a new sequential ID generator.
@@ -60,7 +68,8 @@ class SequentialIDGenerator:
         else:
             start = 1
 
-        self._current = start
+        self._next = start
+        self._lock = Lock()
 
 
     @property
@@ -72,7 +81,7 @@ class SequentialIDGenerator:
             The state is opaque, nothing should be assumed about the string
             contents. The state should be stored as-is.
         """
-        return str(self._current)
+        return str(self._next)
 
     def next(self) -> int:
         """Get a next ID.
@@ -80,13 +89,20 @@ class SequentialIDGenerator:
         If the ID has been already marked as used, then it returns the next
         unused one.
         """
-        id = self._current
-        self._current += 1
+        with self._lock:
+            id = self._next
+            self._next = id + 1
         return id
 
     def mark_used(self, id: ID):
-        """Marks an ID as used, so it will not be generated in the future."""
-        self._current = id + 1
+        """Marks an ID as used, so it will not be generated in the future.
+
+        The sequence never goes back, IDs lower than the next ID are already
+        considered used.
+        """
+        with self._lock:
+            if id >= self._next:
+                self._next = id + 1
 
 
 
@@ -4,18 +4,20 @@
 # Date: 2023-03-30
 #
 
-from typing import Optional, TypeVar, Iterator, Iterable
+from typing import Optional, TypeVar, Iterator, Iterable, Type, Collection
+from typing import Sequence, Mapping, MutableMapping, ValuesView, cast
 from typing import TYPE_CHECKING
-from collections import namedtuple
 
 from ..graph import MutableGraph, Node, Edge
+from ..graph import NodePredicate, HasComponentPredicate
 from ..errors import IDError
 
 from .identity import VersionID, ObjectID, SnapshotID
 from .version import VersionState
 from .object import ObjectSnapshot
 from .object_type import ObjectType
-from .frame import FrameBase
+from .frame import FrameBase, StableFrame, ComponentIndex, make_component_index
+from .frame import DependencyIndex, make_dependency_index
 from .component import Component
 
 if TYPE_CHECKING:
@@ -31,14 +33,155 @@ __all__ = [
 ]
 
 
-# TODO: Rename to SnapshotOwnershipReference
-FrameSnapshotReference = namedtuple('FrameSnapshotReference', ['snapshot', 'owned'])
-"""Annotated reference to a snapshot object from a frame. The `owned` property
-is a flag that denotes whether the version frame owns the snapshot, that is,
-whether changes can be made to the snapshot without need to derive it.
+class CowSnapshotMap(MutableMapping[ObjectID, ObjectSnapshot]):
+    """Copy-on-write mapping of object IDs to snapshots of a mutable frame.
 
-Changes to an unowned snapshot require that the snapshot is derived first.
-"""
+    The map shares the snapshot dictionary of the original stable frame and
+    keeps only the local changes: inserted or derived snapshots in an overlay
+    and IDs of removed original objects. The original dictionary is never
+    modified.
+
+    The map also keeps track of snapshots owned by the frame, that is,
+    snapshots that can be changed without need to derive them. Changes to an
+    unowned snapshot require that the snapshot is derived first. Snapshots of
+    the original are never owned.
+
+    Iteration follows the order of the original objects followed by the
+    newly inserted objects.
+    """
+
+    parent: Mapping[ObjectID, ObjectSnapshot]
+    """Snapshots of the original frame. Not modified by the map."""
+
+    overlay: dict[ObjectID, ObjectSnapshot]
+    """Snapshots that were inserted or derived within the mutable frame."""
+
+    owned: set[ObjectID]
+    """IDs of objects in the overlay that are owned by the frame."""
+
+    removed: set[ObjectID]
+    """IDs of objects of the original frame that were removed."""
+
+    _length: int
+
+    def __init__(self, parent: Optional[Mapping[ObjectID, ObjectSnapshot]] = None):
+        self.parent = parent if parent is not None else dict()
+        self.overlay = dict()
+        self.owned = set()
+        self.removed = set()
+        self._length = len(self.parent)
+
+    def __getitem__(self, id: ObjectID) -> ObjectSnapshot:
+        try:
+            return self.overlay[id]
+        except KeyError:
+            pass
+        if id in self.removed:
+            raise KeyError(id)
+        return self.parent[id]
+
+    def __setitem__(self, id: ObjectID, snapshot: ObjectSnapshot):
+        """Set a snapshot that is not owned by the frame."""
+        self.set(id, snapshot, owned=False)
+
+    def set(self, id: ObjectID, snapshot: ObjectSnapshot, owned: bool):
+        """Set a snapshot and whether it is owned by the frame."""
+        if id not in self:
+            self._length += 1
+        self.overlay[id] = snapshot
+        self.removed.discard(id)
+        if owned:
+            self.owned.add(id)
+        else:
+            self.owned.discard(id)
+
+    def __delitem__(self, id: ObjectID):
+        if id not in self:
+            raise KeyError(id)
+        self.overlay.pop(id, None)
+        self.owned.discard(id)
+        if id in self.parent:
+            self.removed.add(id)
+        self._length -= 1
+
+    def pop(self, id: ObjectID) -> ObjectSnapshot:
+        """Remove a snapshot from the map and return it.
+
+        :raises KeyError: If the map does not contain the object.
+        """
+        overlay = self.overlay
+        if id in overlay:
+            snapshot = overlay.pop(id)
+            self.owned.discard(id)
+            if id in self.parent:
+                self.removed.add(id)
+        elif id not in self.removed:
+            snapshot = self.parent[id]
+            self.removed.add(id)
+        else:
+            raise KeyError(id)
+        self._length -= 1
+        return snapshot
+
+    def __contains__(self, id: object) -> bool:
+        return id in self.overlay \
+                or (id not in self.removed and id in self.parent)
+
+    def __iter__(self) -> Iterator[ObjectID]:
+        overlay = self.overlay
+        removed = self.removed
+        parent = self.parent
+        for id in parent:
+            if id not in removed:
+                yield id
+        for id in overlay:
+            if id not in parent:
+                yield id
+
+    def __len__(self) -> int:
+        return self._length
+
+    def values(self) -> ValuesView[ObjectSnapshot]:
+        return CowSnapshotValues(self)
+
+    def iter_snapshots(self) -> Iterator[ObjectSnapshot]:
+        """Iterate over the snapshots in the same order as over the IDs,
+        without looking up each ID."""
+        overlay = self.overlay
+        removed = self.removed
+        parent = self.parent
+        if not overlay and not removed:
+            # Unchanged map, iterate the original in C.
+            yield from parent.values()
+            return
+        for id, snapshot in parent.items():
+            if id in removed:
+                continue
+            yield overlay.get(id, snapshot)
+        for id, snapshot in overlay.items():
+            if id not in parent:
+                yield snapshot
+
+    def flatten(self) -> dict[ObjectID, ObjectSnapshot]:
+        """Create a new dictionary of all snapshots in the map.
+
+        The original dictionary is copied as a whole and only the local
+        changes are applied to the copy.
+        """
+        result = dict(self.parent)
+        for id in self.removed:
+            del result[id]
+        result.update(self.overlay)
+        return result
+
+
+class CowSnapshotValues(ValuesView[ObjectSnapshot]):
+    """Live view of snapshots of a copy-on-write snapshot map."""
+
+    _mapping: CowSnapshotMap
+
+    def __iter__(self) -> Iterator[ObjectSnapshot]:
+        return self._mapping.iter_snapshots()
 
 
 class MutableFrame(FrameBase):
@@ -63,37 +206,63 @@ class MutableFrame(FrameBase):
     """Mutability state of the frame. Once the frame has been accepted to the 
     memory, it can no longer be mutated."""
 
-    _snapshot_ids: set[SnapshotID]
-    _snapshots: dict[ObjectID, FrameSnapshotReference]
+    _snapshot_ids: Optional[set[SnapshotID]]
+    """Snapshot IDs of the frame objects, used in assertions only. Created on
+    first use."""
+    _snapshots: CowSnapshotMap
 
     # TODO: Change this to be an observable instead of storing it here.
     _removed_objects: list[ObjectID]
-    # TODO: This is redundant, we have the information in the
-    # FrameSnapshotReference. Remove this.
+    # TODO: This is redundant, we have the information in the owned
+    # objects of the snapshot map. Remove this.
     _derived_objects: dict[ObjectID, ObjectSnapshot]
+
+    _original: Optional[StableFrame]
+    """Frame this frame was derived from, if any. Its indexes are used for
+    the objects that were not changed in this frame."""
+
+    _base_dependency_index: Optional[DependencyIndex]
+    """Index of structural dependants of the objects the frame was created
+    with when there is no original frame. Created on first use."""
+
+    _base_component_index: Optional[ComponentIndex]
+    """Index of components of the objects the frame was created with when
+    there is no original frame. Created on first use."""
     
     def __init__(self,
                  memory: "ObjectMemory",
                  version: VersionID,
-                 objects: Optional[Iterator[ObjectSnapshot]] = None):
+                 objects: Optional[Iterator[ObjectSnapshot]] = None,
+                 original: Optional[StableFrame] = None):
         """Create a new version frame for a version `version`.
 
         :param VersionID version: Version ID of the new frame. It must be unique within the database.
         :param dict[ObjectID, ObjectSnapshot] objetcs: optional dictionary of objects that will be associated with this frame.
+        :param StableFrame original: optional frame to derive the new frame
+            from. Snapshots of the original are shared, not copied.
         """
         self.version = version
         self.state = VersionState.UNSTABLE
         self.memory = memory
-        self._snapshots = dict()
-        self._snapshot_ids = set()
+        self._original = original
+        if original is not None:
+            self._snapshots = CowSnapshotMap(original._snapshots)
+        elif objects is not None:
+            # Initial objects are not owned, so they can be used directly as
+            # the shared base of the snapshot map.
+            self._snapshots = CowSnapshotMap({obj.id: obj for obj in objects})
+            objects = None
+        else:
+            self._snapshots = CowSnapshotMap()
+        self._snapshot_ids = None
         self._removed_objects = list()
         self._derived_objects = dict()
+        self._base_dependency_index = None
+        self._base_component_index = None
 
         if objects is not None:
             for obj in objects:
-                ref = FrameSnapshotReference(snapshot=obj, owned=False)
-                self._snapshots[obj.id] = ref
-                self._snapshot_ids.add(obj.snapshot_id)
+                self._snapshots[obj.id] = obj
 
     @property
     def has_changes(self) -> bool:
@@ -111,15 +280,157 @@ class MutableFrame(FrameBase):
 
 
     @property
-    def snapshots(self) -> Iterator[ObjectSnapshot]:
-        """Get a sequence of all snapshots within the frame."""
-        for (snapshot, _) in self._snapshots.values():
-            yield snapshot
+    def snapshots(self) -> Collection[ObjectSnapshot]:
+        """Get a collection of all snapshots within the frame. The collection
+        is a live view of the frame."""
+        return self._snapshots.values()
+
+    def snapshot_dict(self) -> Mapping[ObjectID, ObjectSnapshot]:
+        """Get a dictionary of all snapshots within the frame. Only the
+        changes are applied to a copy of the original frame snapshots.
+
+        If the frame has no changes, the snapshot dictionary of the original
+        frame is returned as-is. It must not be modified.
+
+        :raises RuntimeError: if the frame contains a mutable snapshot.
+        """
+        snapshots = self._snapshots
+
+        # Snapshots of the original frame are frozen, only the local changes
+        # and the initial objects of a frame without an original are checked.
+        if self._original is None:
+            candidates = snapshots.iter_snapshots()
+        else:
+            candidates = iter(snapshots.overlay.values())
+        if any(snapshot.state.is_mutable for snapshot in candidates):
+            raise RuntimeError("Trying to create a stable frame with a mutable object snapshot.")
+
+        if not snapshots.overlay and not snapshots.removed:
+            return snapshots.parent
+        return snapshots.flatten()
+
+    def integrity_violation(self) -> Optional[tuple[ObjectID, ObjectID]]:
+        """Find an object with a missing structural dependency.
+
+        :return: Tuple of the object ID and the missing dependency ID of the
+            first violation found, or `None` if the frame has referential
+            integrity.
+
+        The original frame is expected to have referential integrity,
+        therefore only two kinds of objects are checked in a single pass:
+        objects inserted or derived in this frame, and original objects
+        depending on an object that was removed in this frame.
+        """
+        snapshots = self._snapshots
+        contains = snapshots.__contains__
+        overlay = snapshots.overlay
+
+        # Dependencies shared by multiple objects, such as nodes with many
+        # edges, are looked up only once.
+        checked: set[ObjectID] = set()
+        for id, snapshot in overlay.items():
+            for dep in snapshot.structural_dependencies():
+                if dep in checked:
+                    continue
+                if not contains(dep):
+                    return (id, dep)
+                checked.add(dep)
+
+        if removed := snapshots.removed:
+            for dep in removed:
+                for id in self._base_dependants(dep):
+                    if id not in overlay and id not in removed:
+                        return (id, dep)
+
+        return None
+
+    def structural_dependants(self, id: ObjectID) -> list[ObjectID]:
+        """Get objects that depend on the object with `id`.
+
+        Dependants among the unchanged original objects are taken from an
+        index, only the objects inserted or derived in this frame are scanned.
+        """
+        snapshots = self._snapshots
+        overlay = snapshots.overlay
+        removed = snapshots.removed
+        dependants: list[ObjectID] = list()
+
+        dependants += (dep_id for dep_id in self._base_dependants(id)
+                       if dep_id not in overlay and dep_id not in removed)
+
+        dependants += (dep_id for dep_id, snapshot in overlay.items()
+                       if id in snapshot.structural_dependencies())
+
+        return dependants
+
+    def _base_dependants(self, id: ObjectID) -> Iterable[ObjectID]:
+        """Get dependants of the object with `id` among the objects the frame
+        was created with: the objects of the original frame or the initial
+        objects. Local changes are not considered."""
+        if self._original is not None:
+            return self._original.structural_dependants(id)
+
+        # The base of the snapshot map is never modified, the index stays
+        # valid for the lifetime of the frame.
+        if self._base_dependency_index is None:
+            self._base_dependency_index = \
+                    make_dependency_index(self._snapshots.parent.values())
+        return self._base_dependency_index.get(id, ())
+
+    def _has_snapshot_id(self, snapshot_id: SnapshotID) -> bool:
+        """Check whether the frame contains a snapshot with given snapshot
+        ID. Used in assertions only."""
+        if self._snapshot_ids is None:
+            self._snapshot_ids = set(snapshot.snapshot_id
+                                     for snapshot in self.snapshots)
+        return snapshot_id in self._snapshot_ids
 
     def contains(self, id: ObjectID) -> bool:
         """:return: `True` if the frame constains objects with object identity `id`."""
         return id in self._snapshots
 
+    @property
+    def object_ids(self) -> Collection[ObjectID]:
+        """Collection of IDs of objects in the frame, for bulk membership
+        tests. The collection is a live view of the frame."""
+        # The snapshot map iterates over the IDs, a keys view would only add
+        # another call to each membership test.
+        return self._snapshots
+
+    def objects_with_component(self,
+                               component_type: Type[Component]) -> Iterable[ObjectID]:
+        """Get IDs of objects that have a component of type
+        `component_type`.
+
+        Unchanged original objects are frozen, they are taken from an index.
+        Objects inserted or derived in this frame are scanned on every call,
+        so changes of their components, such as through `mutable_object()`,
+        are always reflected. The original objects come first, followed by
+        the objects changed in this frame.
+        """
+        snapshots = self._snapshots
+        overlay = snapshots.overlay
+        removed = snapshots.removed
+
+        result = [id for id in self._base_objects_with_component(component_type)
+                  if id not in overlay and id not in removed]
+        result += (id for id, snapshot in overlay.items()
+                   if component_type in snapshot.components)
+        return result
+
+    def _base_objects_with_component(self,
+                                     component_type: Type[Component]) -> Iterable[ObjectID]:
+        """Get IDs of objects with a component of type `component_type` among
+        the objects the frame was created with. Local changes are not
+        considered."""
+        if self._original is not None:
+            return self._original.objects_with_component(component_type)
+
+        if self._base_component_index is None:
+            self._base_component_index = \
+                    make_component_index(self._snapshots.parent.values())
+        return self._base_component_index.get(component_type, ())
+
     def object(self, id: ObjectID) -> ObjectSnapshot:
         """
         Returns an object with given identity if the frame contains it.
@@ -129,8 +440,7 @@ class MutableFrame(FrameBase):
 
         # TODO: Make mutable/immutable version of this method.
         try:
-            ref = self._snapshots[id]
-            return ref.snapshot
+            return self._snapshots[id]
         except KeyError:
             raise IDError(id)
 
@@ -150,13 +460,12 @@ class MutableFrame(FrameBase):
         assert (self.state.is_mutable), \
                 f"Trying to modify accepted frame (id: {self.version})"
         assert (snapshot.id not in self._snapshots)
-        assert (snapshot.snapshot_id not in self._snapshot_ids)
+        assert not self._has_snapshot_id(snapshot.snapshot_id)
         # TODO: Check that we do not own a snapshot with given snapshot ID
         
-        ref = FrameSnapshotReference(snapshot=snapshot, owned=owned)
-
-        self._snapshots[snapshot.id] = ref
-        self._snapshot_ids.add(snapshot.snapshot_id)
+        self._snapshots.set(snapshot.id, snapshot, owned=owned)
+        if self._snapshot_ids is not None:
+            self._snapshot_ids.add(snapshot.snapshot_id)
 
 
     # TODO: Reconsider existence of this method
@@ -235,21 +544,17 @@ class MutableFrame(FrameBase):
                 f"Trying to modify accepted frame (id: {self.version})"
         assert id in self._snapshots
 
-        # Note: I did it this way because the type inference for tuple was not
-        # working and I wanted it to be have correctly.
-        ref = self._snapshots[id]
-        original: ObjectSnapshot = ref.snapshot
-        owned: bool = ref.owned
+        original = self._snapshots[id]
 
-        assert not owned, \
+        assert id not in self._snapshots.owned, \
                  "Trying to derive already derived object"
 
         snapshot_id = self.memory.identity_generator.next()
 
         derived = original.derive(snapshot_id=snapshot_id)
-        self._snapshots[id] = FrameSnapshotReference(snapshot=derived,
-                                                  owned=True)
-        self._snapshot_ids.add(id)
+        self._snapshots.set(id, derived, owned=True)
+        if self._snapshot_ids is not None:
+            self._snapshot_ids.add(derived.snapshot_id)
         return derived
     
 
@@ -286,22 +591,22 @@ class MutableFrame(FrameBase):
 
     
     def remove_cascading(self, id: ObjectID) -> list[ObjectID]:
-        """Remove object from the frame including all it dependants."""
+        """Remove object from the frame including all it dependants.
+
+        :raises IDError: If there is no object with given ID.
+        """
         assert (self.state.is_mutable), \
                 f"Trying to modify accepted frame (id: {self.version})"
-        assert id in self._snapshots, \
-                     f"Trying to remove an object ({id}) that is not in the frame {self.version}"
 
         # Preliminary implementation, works for edge-like objects. Good for
         # now.
-        removed: list[ObjectID] = list()
+        #
+        # An object that is not in the frame has no dependants, nothing is
+        # removed before _remove() raises an error.
+        removed = self.structural_dependants(id)
 
-        for (dep_id, ref) in self._snapshots.items():
-            dep = ref.snapshot
-            if id not in dep.structural_dependencies():
-                continue
+        for dep_id in removed:
             self._remove(dep_id)
-            removed.append(dep_id)
 
         self._remove(id)
 
@@ -313,29 +618,15 @@ class MutableFrame(FrameBase):
         # TODO: Rename to remove_unsafe and recommend remove_cascading()
         assert (self.state.is_mutable), \
                 f"Trying to modify accepted frame (id: {self.version})"
-        assert id in self._snapshots, \
-                     f"Trying to remove an object ({id}) that is not in the frame {self.version}"
-        snapshot = self._snapshots[id].snapshot
-        del self._snapshots[id]
+        try:
+            snapshot = self._snapshots.pop(id)
+        except KeyError:
+            raise IDError(id)
 
-        self._snapshot_ids.remove(snapshot.snapshot_id)
+        if self._snapshot_ids is not None:
+            self._snapshot_ids.discard(snapshot.snapshot_id)
         self._removed_objects.append(id)
-    
 
-    # TODO: This is not used any more.
-
-    # def make_transient(self):
-    #     """Make the frame transient.
-    #
-    #     All objects in the frame that are unstable will be made transient.
-    #     """
-    #     for ref in self._snapshots.values():
-    #         obj = ref.snapshot
-    #         if obj.version == self.version and obj.state == VersionState.UNSTABLE:
-    #             obj.make_transient()
-    #
-    #     self.state = VersionState.TRANSIENT
-    
 
     def freeze(self):
         """Make the frame frozen.
@@ -349,10 +640,13 @@ class MutableFrame(FrameBase):
         assert (self.state.is_mutable), \
                 f"Trying to modify accepted frame (id: {self.version})"
 
-        # Freeze derived objects
-        for ref in self._snapshots.values():
-            (obj, owned) = ref
-            if owned and obj.state != VersionState.FROZEN:
+        # Freeze derived objects, only the local changes can be owned.
+        # Version states are enum members, compare them by identity.
+        overlay = self._snapshots.overlay
+        frozen = VersionState.FROZEN
+        for id in self._snapshots.owned:
+            obj = overlay[id]
+            if obj.state is not frozen:
                 obj.freeze()
 
         self.state = VersionState.FROZEN
@@ -400,6 +694,14 @@ class MutableUnboundGraph(MutableGraph):
         return (obj for obj in self.frame.snapshots
                 if isinstance(obj, Edge))
 
+    def select_nodes(self, predicate: NodePredicate) -> Iterable[Node]:
+        if isinstance(predicate, HasComponentPredicate):
+            objects = (self.frame.object(id)
+                       for id in predicate.match_all(self.frame))
+            return (obj for obj in objects if isinstance(obj, Node))
+        else:
+            return super().select_nodes(predicate)
+
     def node(self, id: ObjectID) -> Node:
         node = self.frame.object(id)
 
@@ -415,6 +717,11 @@ class MutableUnboundGraph(MutableGraph):
             return edge
         else:
             raise TypeError
+
+    def nodes_multi(self, ids: Sequence[ObjectID]) -> list[Node]:
+        objects = self.frame.object
+        return cast(list[Node], [objects(id) for id in ids])
+
     def insert_node(self, node: Node):
         self.frame.insert_derived(node)
 
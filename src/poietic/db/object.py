@@ -7,6 +7,7 @@
 from typing import Optional, TypeVar, Type, Self, cast, TYPE_CHECKING
 
 from ..persistence.store import ExtendedPersistentRecord, PersistentRecord
+from ..persistence.store import PersistentValue
 from ..metamodel import MetamodelBase
 
 from .identity import ObjectID, SnapshotID
@@ -31,7 +32,13 @@ class ObjectSnapshot:
     within the database.
 
     Object has an identity that is unique within a database.
+
+    Snapshots are the most numerous objects in the memory, therefore they
+    and their subclasses are slotted, so that the fields are stored
+    compactly in the snapshot itself.
     """
+    __slots__ = ("id", "snapshot_id", "state", "type", "components")
+
     structural_type_name: str = "object"
     # TODO: Rename id to _persistent_id
     # TODO: Rename version to _persistent_version
@@ -55,6 +62,10 @@ class ObjectSnapshot:
 
     components: ComponentSet
 
+    _structural_dependencies: frozenset[ObjectID] = frozenset()
+    """Objects that the receiver structurally depends on. Subclasses with
+    dependencies set it when the object is created."""
+
 
     def __init__(self,
                  id: ObjectID,
@@ -139,27 +150,28 @@ class ObjectSnapshot:
           ``edge`` at the moment.
 
         """
-        record = ExtendedPersistentRecord()
-
-        record["object_id"] = self.id
-        record["snapshot_id"] = self.snapshot_id
-        if self.type is not None:
-            record["type"] = self.type.name
-        else:
-            record["type"] = "object"
+        # The record is created from prepared dictionaries, this method is
+        # called for every snapshot when the memory is saved.
 
         # Note: Writing structural type is redundant here, because we can
         # derive it from the metamodel. It is written here only for the
         # convenience of the model readers if they do not have the
         # metamodel available to them.
 
-        record["structural_type"] = self.structural_type_name
+        primary: dict[str, PersistentValue] = {
+            "object_id": self.id,
+            "snapshot_id": self.snapshot_id,
+            "type": self.type.name if self.type is not None else "object",
+            "structural_type": self.structural_type_name,
+        }
 
-        for name, component in self.components.persistable_components.items():
-            comp_record = component.persistent_record()
-            record.set_component(name, comp_record)
+        components = {
+            name: component.persistent_record()
+            for name, component
+            in self.components.persistable_components.items()
+        }
 
-        return record
+        return ExtendedPersistentRecord(primary, components)
 
 
     def derive(self,
@@ -216,18 +228,20 @@ class ObjectSnapshot:
 
 
     def __getitem__(self, key: Type[C]) -> C:
-        return self.components.get(key)
+        # Skip the ComponentSet.get() call, this is used in hot paths such as
+        # reading expressions of all nodes during compilation.
+        return self.components._components[key] # type: ignore
 
     def __setitem__(self, key: Type[C], value: C):
         # TODO: This is weird, we do not need key here
         self.components.set(value)
 
-    def structural_dependencies(self) -> list[ObjectID]:
+    def structural_dependencies(self) -> frozenset[ObjectID]:
         """Return objects that structurally depend on the receiver.
 
         For example an edge depends on a node that is an endpoint of the edge.
         """
-        return []
+        return self._structural_dependencies
 
     def __eq__(self, other: Self) -> bool:
         if type(other) != type(self):
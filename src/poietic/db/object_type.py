@@ -49,6 +49,14 @@ class ObjectType:
     or a Node. If not provided, then the object might be of any structural type
     """
 
+    bit: int
+    """Index of a bit that is distinct for each object type of a meta-model.
+    Assigned when the meta-model class is declared, see `MetamodelBase`."""
+
+    mask: int
+    """Integer with only the type's `bit` set. A set of types can be tested
+    for membership with a single bitwise _and_ of their masks."""
+
     def __init__(self,
                  name: str,
                  structural_type: Optional[Type["ObjectSnapshot"]] = None,
@@ -9,4 +9,5 @@
 # These modules are quite low-level, we are not exposing them at the top-level
 from . import parser # pyright: ignore
 from . import lexer # pyright: ignore
+from . import optimize # pyright: ignore
 from .expression import *
@@ -1,8 +1,12 @@
-from typing import TypeVar, Generic, ClassVar, cast
+from typing import TypeVar, Generic, ClassVar, Any, TYPE_CHECKING, cast
 from abc import abstractmethod
 from enum import Enum, auto
+from weakref import WeakValueDictionary
 from ..value import ValueProtocol
 
+if TYPE_CHECKING:
+    from typing import Self
+
 __all__ = [
     "NullExpressionNode",
     "ValueExpressionNode",
@@ -40,12 +44,64 @@ class ExpressionKind(Enum):
     FUNCTION = auto()
 
 
+_interned_nodes: WeakValueDictionary[tuple, "ExpressionNode"] = \
+        WeakValueDictionary()
+"""Table of interned expression nodes. See `ExpressionNode.intern()`."""
+
+
 class ExpressionNode(Generic[V, F]):
     """Abstract class for all expression nodes. The sublcasses are required to
-    implement the methods `children()` and `all_variables()`."""
+    implement the methods `children()` and `all_variables()`.
+
+    Nodes are slotted – subclasses are expected to declare `__slots__` with
+    their own attributes. The `kind` is a class variable.
+    """
+    # Weak reference is required by the table of interned nodes.
+    __slots__ = ("_key", "_hash", "__weakref__")
 
     kind: ClassVar[ExpressionKind]
 
+    _key: tuple
+    """Structural key of the node: the node kind followed by the node contents
+    and children. Used for equality comparison."""
+
+    _hash: int
+    """Structural hash of the node, a hash of the `_key` computed at the node
+    creation."""
+
+    @classmethod
+    def intern(cls, *args: Any) -> "Self":
+        """Create a node or return an existing structurally identical node.
+
+        Structurally identical sub-expressions created through this method
+        share a single node object, which turns the expression trees into a
+        directed acyclic graph.
+
+        Children passed to this method are expected to be interned as well.
+
+        .. note::
+
+            Interned nodes are shared and must not be mutated.
+        """
+        node = cls(*args)
+        return cast("Self", _interned_nodes.setdefault(node._intern_key(), node))
+
+    @abstractmethod
+    def _intern_key(self) -> tuple:
+        """Key of the node in the table of interned nodes. Children are
+        represented by their identity, since they are interned."""
+        pass
+
+    def __eq__(self, other) -> bool:
+        if self is other:
+            return True
+        if not isinstance(other, ExpressionNode):
+            return False
+        return self._hash == other._hash and self._key == other._key
+
+    def __hash__(self) -> int:
+        return self._hash
+
     @abstractmethod
     def children(self) -> list["ExpressionNode[V, F]"]:
         """List of sub-expressions of the expression node."""
@@ -63,6 +119,8 @@ class ExpressionNode(Generic[V, F]):
 
 # TODO: Is this still needed?
 class NullExpressionNode(ExpressionNode, Generic[V, F]):
+    __slots__ = ()
+
     kind: ClassVar[ExpressionKind] = ExpressionKind.NULL
 
     def children(self) -> list["ExpressionNode[V, F]"]:
@@ -71,11 +129,12 @@ class NullExpressionNode(ExpressionNode, Generic[V, F]):
     def all_variables(self) -> list[V]:
         return []
 
-    def __eq__(self, other) -> bool:
-        if not isinstance(other, self.__class__):
-            return False
+    def __init__(self):
+        self._key = (self.kind, )
+        self._hash = hash(self._key)
 
-        return other.kind == self.kind
+    def _intern_key(self) -> tuple:
+        return (self.kind, )
 
     def __str__(self) -> str:
         return "null"
@@ -83,6 +142,7 @@ class NullExpressionNode(ExpressionNode, Generic[V, F]):
 
 class ValueExpressionNode(ExpressionNode, Generic[V, F]):
     """Expression node representing a concrete value."""
+    __slots__ = ("value", )
 
     kind: ClassVar[ExpressionKind] = ExpressionKind.VALUE
 
@@ -96,14 +156,12 @@ class ValueExpressionNode(ExpressionNode, Generic[V, F]):
 
     def __init__(self, value: ValueProtocol):
         self.value = value
+        self._key = (self.kind, self.value)
+        self._hash = hash(self._key)
 
-    def __eq__(self, other) -> bool:
-        if not isinstance(other, self.__class__):
-            return False
-
-        t_other = cast(ValueExpressionNode[V, F], other)
-        return other.kind == self.kind \
-                and self.value == t_other.value
+    def _intern_key(self) -> tuple:
+        # Values of different types might be equal, such as 1 and 1.0
+        return (self.kind, type(self.value), self.value)
 
     def __str__(self) -> str:
         return f"{self.value}"
@@ -112,8 +170,9 @@ class ValueExpressionNode(ExpressionNode, Generic[V, F]):
 
 class UnaryExpressionNode(ExpressionNode, Generic[V, F]):
     """Expression node representing an unary operation."""
+    __slots__ = ("operator", "operand")
 
-    kind: ExpressionKind = ExpressionKind.UNARY
+    kind: ClassVar[ExpressionKind] = ExpressionKind.UNARY
 
     operator: F
     """Unary operator"""
@@ -123,20 +182,16 @@ class UnaryExpressionNode(ExpressionNode, Generic[V, F]):
     def children(self) -> list["ExpressionNode[V, F]"]:
         return [self.operand]
     def all_variables(self) -> list[V]:
-        return self.operand.all_variables()
+        return all_variables(self)
 
     def __init__(self, operator: F, operand: ExpressionNode[V, F]):
         self.operator = operator
         self.operand = operand
+        self._key = (self.kind, self.operator, self.operand)
+        self._hash = hash(self._key)
 
-    def __eq__(self, other) -> bool:
-        if not isinstance(other, self.__class__):
-            return False
-
-        t_other = cast(UnaryExpressionNode[V, F], other)
-        return other.kind == self.kind \
-                and self.operator == t_other.operator \
-                and self.operand == t_other.operand
+    def _intern_key(self) -> tuple:
+        return (self.kind, self.operator, id(self.operand))
 
     def __str__(self) -> str:
         return f"{self.operator}{self.operand}"
@@ -144,8 +199,9 @@ class UnaryExpressionNode(ExpressionNode, Generic[V, F]):
 class BinaryExpressionNode(ExpressionNode, Generic[V, F]):
     """Expression node representing a binary expression. For example an
     expression ``x + y``."""
+    __slots__ = ("operator", "left", "right")
 
-    kind: ExpressionKind = ExpressionKind.BINARY
+    kind: ClassVar[ExpressionKind] = ExpressionKind.BINARY
     operator: F
     """Binary operator."""
 
@@ -158,16 +214,7 @@ class BinaryExpressionNode(ExpressionNode, Generic[V, F]):
         return [self.left, self.right]
 
     def all_variables(self) -> list[V]:
-        result: list[V] = list()
-
-        # NOTE: We are doing it "full-scan" instead of set() becauseV is not Hashable
-        all_vars = self.left.all_variables() + self.right.all_variables()
-
-        for var in all_vars:
-            if var not in result:
-                result.append(var)
-
-        return result
+        return all_variables(self)
 
     def __init__(self, operator: F,
                  left: ExpressionNode[V, F],
@@ -175,16 +222,11 @@ class BinaryExpressionNode(ExpressionNode, Generic[V, F]):
         self.operator = operator
         self.left = left
         self.right = right
+        self._key = (self.kind, self.operator, self.left, self.right)
+        self._hash = hash(self._key)
 
-    def __eq__(self, other) -> bool:
-        if not isinstance(other, self.__class__):
-            return False
-
-        t_other = cast(BinaryExpressionNode[V, F], other)
-        return other.kind == self.kind \
-                and self.operator == t_other.operator \
-                and self.left == t_other.left \
-                and self.right == t_other.right
+    def _intern_key(self) -> tuple:
+        return (self.kind, self.operator, id(self.left), id(self.right))
 
     def __str__(self) -> str:
         return f"{self.left} {self.operator} {self.right}"
@@ -192,7 +234,8 @@ class BinaryExpressionNode(ExpressionNode, Generic[V, F]):
 
 class FunctionExpressionNode(ExpressionNode, Generic[V, F]):
     """Expression node representing a function call, for example ``max(a, b)``."""
-    kind: ExpressionKind = ExpressionKind.FUNCTION
+    __slots__ = ("function", "args")
+    kind: ClassVar[ExpressionKind] = ExpressionKind.FUNCTION
 
     function: F
     """Function reference."""
@@ -204,34 +247,18 @@ class FunctionExpressionNode(ExpressionNode, Generic[V, F]):
         return self.args
 
     def all_variables(self) -> list[V]:
-        result: list[V] = list()
-        all_vars: list[V] = list()
-
-        # NOTE: We are doing it "full-scan" instead of set() becauseV is not Hashable
-        for arg in self.args:
-            all_vars += arg.all_variables()
-
-        for var in all_vars:
-            if var not in result:
-                result.append(var)
-
-        return result
+        return all_variables(self)
 
 
     def __init__(self, function: F, args: list[ExpressionNode[V, F]]):
         self.function = function
         self.args = args
+        self._key = (self.kind, self.function, tuple(self.args))
+        self._hash = hash(self._key)
 
+    def _intern_key(self) -> tuple:
+        return (self.kind, self.function, tuple(id(arg) for arg in self.args))
     
-    def __eq__(self, other) -> bool:
-        if not isinstance(other, self.__class__):
-            return False
-
-        t_other = cast(FunctionExpressionNode[V, F], other)
-        return other.kind == self.kind \
-                and self.function == t_other.function \
-                and self.args == t_other.args 
-
     def __str__(self) -> str:
         args = ", ".join(str(arg) for arg in self.args)
         return f"{self.function}({args})"
@@ -239,7 +266,8 @@ class FunctionExpressionNode(ExpressionNode, Generic[V, F]):
 
 class VariableExpressionNode(ExpressionNode, Generic[V, F]):
     """Expression nod representing a variable - a reference or a name."""
-    kind: ExpressionKind = ExpressionKind.VARIABLE
+    __slots__ = ("variable", )
+    kind: ClassVar[ExpressionKind] = ExpressionKind.VARIABLE
 
     variable: V
 
@@ -250,19 +278,46 @@ class VariableExpressionNode(ExpressionNode, Generic[V, F]):
 
     def __init__(self, variable: V):
         self.variable = variable
+        self._key = (self.kind, self.variable)
+        self._hash = hash(self._key)
 
-    def __eq__(self, other) -> bool:
-        if not isinstance(other, self.__class__):
-            return False
-
-        t_other = cast(VariableExpressionNode[V, F], other)
-        return other.kind == self.kind \
-                and self.variable == t_other.variable
+    def _intern_key(self) -> tuple:
+        return (self.kind, self.variable)
 
     def __str__(self) -> str:
         return f"{self.variable}"
 
 
+def all_variables(root: ExpressionNode[V, F]) -> list[V]:
+    """List of all unique variables used in the expression `root`, including
+    its sub-expressions.
+
+    The expression tree is traversed iteratively, therefore deeply nested
+    expressions do not hit the recursion limit.
+    """
+    result: list[V] = list()
+    seen: set[V] = set()
+    stack: list[ExpressionNode[V, F]] = [root]
+
+    while stack:
+        node = stack.pop()
+        if node.kind is ExpressionKind.VARIABLE:
+            # The type is quoted, subscripting a generic class at run-time
+            # is not free.
+            var = cast("VariableExpressionNode[V, F]", node).variable
+            # Variables are hashable, they are part of the interning keys.
+            if var not in seen:
+                seen.add(var)
+                result.append(var)
+        elif node.kind is not ExpressionKind.VALUE \
+                and node.kind is not ExpressionKind.NULL:
+            # Push in reverse, so the children are visited left to right.
+            # Leaves are skipped to not to create their empty children lists.
+            stack.extend(reversed(node.children()))
+
+    return result
+
+
 UnboundExpression = ExpressionNode[str, str]
 """Expression where the variable and function references are strings.
 
@@ -3,6 +3,8 @@
 # Created by: Stefan Urbanek
 # Date: 2023-03-31
 #
+import re
+import sys
 from typing import Optional, Union, cast, Callable
 from enum import Enum, auto
 
@@ -11,6 +13,7 @@ __all__ = [
     "TokenType",
     "Token",
     "ParserError",
+    "tokenize",
 ]
 
 class TokenType(Enum):
@@ -47,6 +50,89 @@ class ParserError(Enum):
                 return "Unexpected token"
 
 
+# Tokens consisting of a single character, looked-up directly by the
+# character.
+#
+_SIMPLE_TOKENS: dict[str, TokenType] = {
+    "+": TokenType.OPERATOR,
+    "-": TokenType.OPERATOR,
+    "*": TokenType.OPERATOR,
+    "/": TokenType.OPERATOR,
+    "%": TokenType.OPERATOR,
+    "(": TokenType.LEFT_PAREN,
+    ")": TokenType.RIGHT_PAREN,
+    ",": TokenType.COMMA,
+}
+
+# Patterns used by `Lexer.next()` for tokens that are not simple tokens. The
+# whole token is matched by the regular expression engine instead of being
+# accepted character by character.
+#
+# Numbers that are followed by a letter, by a dangling decimal point or by an
+# incomplete exponent are matched as a whole by the `NUMBER_ERROR` group, so
+# the error token contains the offending character as well.
+#
+# Identifiers start with a letter or an underscore.
+#
+_DIGITS = r"\d[\d_]*"
+_EXPONENT = rf"[eE]-?{_DIGITS}"
+_LETTER = r"[^\W\d_]"
+
+_TOKEN_GROUPS = rf"""
+      (?P<FLOAT>        {_DIGITS}(?:\.{_DIGITS}(?:{_EXPONENT})?|{_EXPONENT})(?!\w))
+    | (?P<INT>          {_DIGITS}(?![\w.]))
+    | (?P<NUMBER_ERROR> {_DIGITS}(?:\.{_DIGITS})?(?:{_EXPONENT})?
+                        (?:[eE]-?|\.|{_LETTER}))
+    | (?P<IDENTIFIER>   [^\W\d]\w*)
+    """
+
+_TOKEN_PATTERN = re.compile(_TOKEN_GROUPS, re.VERBOSE)
+
+_TRIVIA_PATTERN = re.compile(r"\s*")
+
+# Rest of a digit run after its first digit, used by `Lexer.accept_number()`.
+_DIGIT_RUN_PATTERN = re.compile(r"[\d_]*")
+
+# Rest of an identifier after its first character, used by
+# `Lexer.accept_identifier()`.
+_IDENTIFIER_TAIL_PATTERN = re.compile(r"\w*")
+
+# Pattern used by `tokenize()` to split the whole source in a single pass.
+# Every character of the source is matched by one of the groups.
+#
+_SCAN_PATTERN = re.compile(rf"""
+      (?P<TRIVIA>       \s+)
+    | (?P<SIMPLE>       [-+*/%(),])
+    | {_TOKEN_GROUPS}
+    | (?P<UNEXPECTED>   .)
+    """, re.VERBOSE | re.DOTALL)
+
+# Character classes of ASCII characters, indexed by the character code. Used
+# by the character-level `Lexer.accept_*()` methods. Characters outside of
+# the ASCII range are classified using the `str` methods.
+#
+_DIGIT_CLASS = 0x01
+_LETTER_CLASS = 0x02
+_SPACE_CLASS = 0x04
+_IDENTIFIER_START_CLASS = 0x08
+
+def _ascii_char_classes() -> bytes:
+    table = bytearray(128)
+    for code in range(128):
+        char = chr(code)
+        if char.isnumeric():
+            table[code] |= _DIGIT_CLASS
+        if char.isalpha():
+            table[code] |= _LETTER_CLASS
+        if char.isspace():
+            table[code] |= _SPACE_CLASS
+        if char.isalpha() or char == "_":
+            table[code] |= _IDENTIFIER_START_CLASS
+    return bytes(table)
+
+_ASCII_CHAR_CLASSES = _ascii_char_classes()
+
+
 class TextLocation:
     """User-oriented location in the text indexed by line and column."""
 
@@ -55,10 +141,11 @@ class TextLocation:
     column: int
     """Column location in the text or expression source."""
 
-    def __init__(self):
-        """Create an initial text location, which is at row 1 and column 1."""
-        self.line = 1
-        self.column = 1
+    def __init__(self, line: int = 1, column: int = 1):
+        """Create a text location. Default location is at row 1 and column
+        1."""
+        self.line = line
+        self.column = column
 
     def advance(self, character: str):
         """Advance the location by one character. If the character is a newline
@@ -70,6 +157,20 @@ class TextLocation:
         else:
             self.column += 1
 
+    def advance_text(self, text: str):
+        """Advance the location by all characters of the `text`."""
+        newlines = text.count("\n")
+
+        if newlines:
+            self.line += newlines
+            self.column = len(text) - text.rfind("\n")
+        else:
+            self.column += len(text)
+
+    def copy(self) -> "TextLocation":
+        """Get a copy of the location."""
+        return TextLocation(self.line, self.column)
+
     def __str__(self) -> str:
         return f"{self.line}:{self.column}"
 
@@ -151,8 +252,12 @@ class Lexer:
     current_char: Optional[str]
     """Currently parsed character or `None` if the lexer is at the end."""
 
-    location: TextLocation
-    """Text location of the parser."""
+    _location: TextLocation
+    """Text location at `_location_index`."""
+
+    _location_index: int
+    """Index in the source string up to which the `_location` is
+    computed."""
 
 
     def __init__(self, source: str):
@@ -164,7 +269,21 @@ class Lexer:
             self.current_char = self.source[self.current_index]
         except IndexError:
             self.current_char = None
-        self.location = TextLocation()
+        self._location = TextLocation()
+        self._location_index = 0
+
+    @property
+    def location(self) -> TextLocation:
+        """Text location of the lexer.
+
+        The location is computed on demand from the characters passed since
+        the last request, the lexer does not track it for each character.
+        """
+        if self._location_index != self.current_index:
+            self._location.advance_text(
+                    self.source[self._location_index:self.current_index])
+            self._location_index = self.current_index
+        return self._location
 
     @property
     def at_end(self) -> bool:
@@ -181,7 +300,6 @@ class Lexer:
 
         try:
             self.current_char = self.source[self.current_index]
-            self.location.advance(self.current_char)
         except IndexError:
             self.current_char = None
 
@@ -199,38 +317,36 @@ class Lexer:
         else:
             return False
 
-    def accept_whitespace(self) -> bool:
-        """Accept current character if it is a whitespace."""
+    def _accept_class(self,
+                      char_class: int,
+                      predicate: Callable[[str], bool]) -> bool:
+        """Accept current character if it is of the ASCII character class
+        `char_class`. Non-ASCII characters are tested with the `predicate`."""
         if not (char := self.current_char):
             return False
 
-        if char.isspace():
+        if (code := ord(char)) < 128:
+            matches = _ASCII_CHAR_CLASSES[code] & char_class
+        else:
+            matches = predicate(char)
+
+        if matches:
             self.accept()
             return True
         else:
             return False
 
+    def accept_whitespace(self) -> bool:
+        """Accept current character if it is a whitespace."""
+        return self._accept_class(_SPACE_CLASS, str.isspace)
+
     def accept_digit(self) -> bool:
         """Accept current character if it is a digit."""
-        if not (char := self.current_char):
-            return False
-
-        if char.isnumeric():
-            self.accept()
-            return True
-        else:
-            return False
+        return self._accept_class(_DIGIT_CLASS, str.isnumeric)
 
     def accept_letter(self) -> bool:
         """Accept current character if it is a letter."""
-        if not (char := self.current_char):
-            return False
-
-        if char.isalpha():
-            self.accept()
-            return True
-        else:
-            return False
+        return self._accept_class(_LETTER_CLASS, str.isalpha)
 
     def accept_pred(self, predicate: Callable[[str], bool]) -> bool:
         """Accept current character if it matches a predicate."""
@@ -244,6 +360,11 @@ class Lexer:
         else:
             return False
 
+    def _accept_digit_run(self):
+        """Accept digits and underscores up to the first other character."""
+        if (match := _DIGIT_RUN_PATTERN.match(self.source, self.current_index)):
+            self._move_to(match.end())
+
     # Lexer methods
     def accept_number(self) -> Optional[ParserResult]:
         """Parse and accept the next token if it is a number.
@@ -256,16 +377,12 @@ class Lexer:
         if not self.accept_digit():
             return None
 
-        while self.accept_digit() or self.accept_char("_"):
-            # Just accept it.
-            pass
+        self._accept_digit_run()
 
         if self.accept_char("."):
             if not self.accept_digit():
                 return ParserResult(ParserError.INVALID_CHAR_IN_NUMBER)
-            while self.accept_digit() or self.accept_char("_"):
-                # Just accept it.
-                pass
+            self._accept_digit_run()
             token_type = TokenType.FLOAT
 
         if self.accept_char("e") or self.accept_char("E"):
@@ -273,9 +390,7 @@ class Lexer:
 
             if not self.accept_digit():
                 return ParserResult(ParserError.INVALID_CHAR_IN_NUMBER)
-            while self.accept_digit() or self.accept_char("_"):
-                # Just accept it.
-                pass
+            self._accept_digit_run()
             token_type = TokenType.FLOAT
 
         if self.accept_letter():
@@ -284,38 +399,43 @@ class Lexer:
             return ParserResult(token_type)
 
     def accept_identifier(self) -> Optional[ParserResult]:
-        """Parse and accept the next token if it is an identifier."""
-        if not self.accept_letter() or self.accept_char("_"):
+        """Parse and accept the next token if it is an identifier. Identifier
+        starts with a letter or an underscore, followed by letters, digits or
+        underscores."""
+        if not self._accept_class(_IDENTIFIER_START_CLASS, str.isalpha):
             return None
 
-        while self.accept_letter() \
-                or self.accept_number() \
-                or self.accept_char("_"):
-            # Just accept it.
-            pass
+        if (match := _IDENTIFIER_TAIL_PATTERN.match(self.source,
+                                                    self.current_index)):
+            self._move_to(match.end())
 
         return ParserResult(TokenType.IDENTIFIER)
 
+    def accept_simple_token(self) -> Optional[ParserResult]:
+        """Accepts a single-character token: an operator or a punctuation
+        character."""
+        if (char := self.current_char) is None:
+            return None
+
+        if (token_type := _SIMPLE_TOKENS.get(char)) is not None:
+            self.accept()
+            return ParserResult(token_type)
+        else:
+            return None
+
     def accept_operator(self) -> Optional[ParserResult]:
         """Accepts arithmetic operator."""
 
-        if self.accept_char("-") \
-                or self.accept_char("+") \
-                or self.accept_char("*") \
-                or self.accept_char("/") \
-                or self.accept_char("%"):
-            return ParserResult(TokenType.OPERATOR)
+        if _SIMPLE_TOKENS.get(self.current_char or "") is TokenType.OPERATOR:
+            return self.accept_simple_token()
         else:
             return None
    
     def accept_punctuation(self) -> Optional[ParserResult]:
         """Accepts punctuation such as parenthesis or a comma."""
-        if self.accept_char("("):
-            return ParserResult(TokenType.LEFT_PAREN)
-        elif self.accept_char(")"):
-            return ParserResult(TokenType.RIGHT_PAREN)
-        elif self.accept_char(","):
-            return ParserResult(TokenType.COMMA)
+        token_type = _SIMPLE_TOKENS.get(self.current_char or "")
+        if token_type is not None and token_type is not TokenType.OPERATOR:
+            return self.accept_simple_token()
         else:
             return None
 
@@ -323,10 +443,9 @@ class Lexer:
         """Accepts one of the valid arithmetic expression tokens: a number, an
         identifier, an operator or a punctuation character (parenthesis or a
         comma)."""
-        return self.accept_number() \
-                or self.accept_identifier() \
-                or self.accept_operator() \
-                or self.accept_punctuation()
+        return self.accept_simple_token() \
+                or self.accept_number() \
+                or self.accept_identifier()
 
     def accept_leading_trivia(self):
         # TODO: Implement trivia parsing
@@ -346,37 +465,104 @@ class Lexer:
                 or self.accept_char('\r'):
             pass
 
+    def _move_to(self, index: int):
+        """Move the lexer to the `index` within the source string."""
+        self.current_index = index
+
+        try:
+            self.current_char = self.source[index]
+        except IndexError:
+            self.current_char = None
+
     def next(self) -> Token:
         """Parse the next token at the lexer's position and return the parsed
         token."""
 
-        start_index: int = self.current_index
-
         # TODO: Include trivia in the token
-        self.accept_leading_trivia()
+        # Leading trivia
+        if (trivia := _TRIVIA_PATTERN.match(self.source, self.current_index)):
+            self._move_to(trivia.end())
+
+        start_index: int = self.current_index
+        location: TextLocation = self.location.copy()
 
         if self.at_end:
             return Token(TokenType.EMPTY,
-                         text=self.source[start_index:],
-                         location=self.location)
-        elif (result := self.accept_token()):
-            end_index = self.current_index
-            self.accept_trailing_trivia()
-
-            if (token_type := result.value):
-                return Token(token_type,
-                             text=self.source[start_index:end_index],
-                             location=self.location)
-            elif (error := result.error):
-                return Token(TokenType.ERROR,
-                             text=self.source[start_index:end_index],
-                             location=self.location,
-                             error=error)
+                         text="",
+                         location=location)
+
+        token_type: TokenType
+        error: Optional[ParserError] = None
+        end_index: int
+
+        if (simple := _SIMPLE_TOKENS.get(self.source[start_index])):
+            token_type = simple
+            end_index = start_index + 1
+        elif (match := _TOKEN_PATTERN.match(self.source, start_index)):
+            if match.lastgroup == "NUMBER_ERROR":
+                token_type = TokenType.ERROR
+                error = ParserError.INVALID_CHAR_IN_NUMBER
             else:
-                raise RuntimeError(f"Unexpected result::result")
+                token_type = TokenType[cast(str, match.lastgroup)]
+            end_index = match.end()
         else:
-            self.accept()
+            self._move_to(start_index + 1)
             return Token(TokenType.ERROR,
                          text=self.source[start_index:self.current_index],
-                         location=self.location,
+                         location=location,
                          error=ParserError.UNEXPECTED_CHARACTER)
+
+        text = self.source[start_index:end_index]
+        if token_type is TokenType.IDENTIFIER:
+            # Identifiers repeat, share one string for each name
+            text = sys.intern(text)
+        self._move_to(end_index)
+
+        # Trailing trivia
+        if (trivia := _TRIVIA_PATTERN.match(self.source, self.current_index)):
+            self._move_to(trivia.end())
+
+        return Token(token_type,
+                     text=text,
+                     location=location,
+                     error=error)
+
+
+def tokenize(source: str) -> list[Token]:
+    """Split the source string into a list of tokens. The list is terminated
+    by a token of type `TokenType.EMPTY`.
+
+    The tokens are the same as the tokens returned by repeated calls of
+    `Lexer.next()`, however the whole source is scanned in a single pass of
+    the regular expression engine.
+    """
+    tokens: list[Token] = list()
+    location = TextLocation()
+
+    for match in _SCAN_PATTERN.finditer(source):
+        kind = match.lastgroup
+        text = match.group()
+
+        if kind == "TRIVIA":
+            location.advance_text(text)
+            continue
+        elif kind == "SIMPLE":
+            token = Token(_SIMPLE_TOKENS[text], text, location.copy())
+        elif kind == "NUMBER_ERROR":
+            token = Token(TokenType.ERROR, text, location.copy(),
+                          error=ParserError.INVALID_CHAR_IN_NUMBER)
+        elif kind == "UNEXPECTED":
+            token = Token(TokenType.ERROR, text, location.copy(),
+                          error=ParserError.UNEXPECTED_CHARACTER)
+        elif kind == "IDENTIFIER":
+            token = Token(TokenType.IDENTIFIER, sys.intern(text),
+                          location.copy())
+        else:
+            token = Token(TokenType[cast(str, kind)], text, location.copy())
+
+        tokens.append(token)
+        location.advance_text(text)
+
+    tokens.append(Token(TokenType.EMPTY, "", location))
+
+    return tokens
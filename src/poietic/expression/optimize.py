@@ -0,0 +1,105 @@
+# optimize.py
+#
+# Expression optimizations
+#
+# Created by: Stefan Urbanek
+# Date: 2023-06-02
+#
+
+import operator
+from typing import Callable, Optional, cast
+
+from .expression import *
+
+__all__ = [
+    "fold_constants",
+]
+
+
+# Only operators that keep their name when bound to the built-in functions
+# are folded, so a folded expression evaluates the same as the original one.
+# The modulo operator is bound to a different function and it is not folded.
+_UNARY_OPERATORS: dict[str, Callable[[float], float]] = {
+    "-": operator.neg,
+}
+
+_BINARY_OPERATORS: dict[str, Callable[[float, float], float]] = {
+    "+": operator.add,
+    "-": operator.sub,
+    "*": operator.mul,
+    "/": operator.truediv,
+}
+
+
+def _numeric_value(node: UnboundExpression) -> Optional[float]:
+    """Get a value of a value node as a float, the way it is evaluated. Returns
+    `None` if the node is not a value node or the value is not numeric."""
+    if not isinstance(node, ValueExpressionNode):
+        return None
+    value = node.value
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    else:
+        return None
+
+
+def fold_constants(expr: UnboundExpression) -> UnboundExpression:
+    """Return an expression where operations with only constant operands are
+    replaced by their resulting value. For example ``2 * 3 + x`` becomes
+    ``6 + x``.
+
+    Only numeric operands are folded and the results are floats, the same
+    as in the evaluation. Operations that can not be evaluated, such as
+    division by zero, and function calls are left as they are, so the error
+    is raised during evaluation. Unchanged sub-expressions are returned as-is,
+    new nodes are interned.
+    """
+    match expr.kind:
+        case ExpressionKind.UNARY:
+            unary = cast(UnaryExpressionNode, expr)
+            operand = fold_constants(unary.operand)
+
+            value = _numeric_value(operand)
+            if value is not None \
+                    and (op := _UNARY_OPERATORS.get(unary.operator)):
+                try:
+                    return ValueExpressionNode.intern(op(value))
+                except ArithmeticError:
+                    pass
+
+            if operand is unary.operand:
+                return expr
+            else:
+                return UnaryExpressionNode.intern(unary.operator, operand)
+
+        case ExpressionKind.BINARY:
+            binary = cast(BinaryExpressionNode, expr)
+            left = fold_constants(binary.left)
+            right = fold_constants(binary.right)
+
+            lvalue = _numeric_value(left)
+            rvalue = _numeric_value(right)
+            if lvalue is not None and rvalue is not None \
+                    and (op := _BINARY_OPERATORS.get(binary.operator)):
+                try:
+                    return ValueExpressionNode.intern(op(lvalue, rvalue))
+                except ArithmeticError:
+                    pass
+
+            if left is binary.left and right is binary.right:
+                return expr
+            else:
+                return BinaryExpressionNode.intern(binary.operator,
+                                                   left, right)
+
+        case ExpressionKind.FUNCTION:
+            function = cast(FunctionExpressionNode, expr)
+            args = list(fold_constants(arg) for arg in function.args)
+
+            if all(new is old for new, old in zip(args, function.args)):
+                return expr
+            else:
+                return FunctionExpressionNode.intern(function.function, args)
+
+        case _:
+            return expr
@@ -6,12 +6,15 @@
 
 from typing import Optional, Union, cast
 from enum import Enum, auto
+from functools import lru_cache
 
-from .lexer import Lexer, TokenType, Token, ParserError
+from .lexer import Lexer, TokenType, Token, ParserError, tokenize
 from .expression import *
+from .optimize import fold_constants
 
 __all__ = [
     "ExpressionParser",
+    "parse_expression",
 ]
 
 # https:#craftinginterpreters.com/parsing-expressions.html
@@ -75,15 +78,19 @@ class ExpressionParser:
     context for a function `parse()` that converts the expression source string
     into an unbound expression object."""
 
-    lexer: Lexer
+    tokens: list[Token]
+    """List of tokens of the parsed source string, terminated by an empty
+    token."""
+    current_index: int
     current_token: Optional[Token]
     
     def __init__(self, string: str):
         """
         Creates a new parser for an expression source string.
         """
-        self.lexer = Lexer(string)
-        self.advance()
+        self.tokens = tokenize(string)
+        self.current_index = 0
+        self.current_token = self.tokens[0]
     
     
     @property
@@ -100,9 +107,12 @@ class ExpressionParser:
     
     def advance(self):
         """
-        Advance to the next token.
+        Advance to the next token. The parser stays at the terminating empty
+        token once it reaches it.
         """
-        self.current_token = self.lexer.next()
+        if self.current_index < len(self.tokens) - 1:
+            self.current_index += 1
+        self.current_token = self.tokens[self.current_index]
     
     
     def accept(self, token_type: TokenType) -> Optional[Token]:
@@ -279,15 +289,15 @@ class ExpressionParser:
         match ast.kind:
             case ExpressionASTKind.INT:
                 ivalue: int = int(cast(Token, ast.items[0]).text) 
-                return ValueExpressionNode(ivalue)
+                return ValueExpressionNode.intern(ivalue)
 
             case ExpressionASTKind.DOUBLE:
                 fvalue: float = float(cast(Token, ast.items[0]).text) 
-                return ValueExpressionNode(fvalue)
+                return ValueExpressionNode.intern(fvalue)
 
             case ExpressionASTKind.VARIABLE:
                 var: str = cast(Token, ast.items[0]).text
-                return VariableExpressionNode(var)
+                return VariableExpressionNode.intern(var)
 
             case ExpressionASTKind.PARENTHESIS:
                 expr: ExpressionAST = cast(ExpressionAST, ast.items[1])
@@ -296,13 +306,13 @@ class ExpressionParser:
             case ExpressionASTKind.UNARY:
                 operator: str = cast(Token, ast.items[0]).text
                 operand = self.make_unbound(cast(ExpressionAST, ast.items[1]))
-                return UnaryExpressionNode(operator, operand)
+                return UnaryExpressionNode.intern(operator, operand)
 
             case ExpressionASTKind.BINARY:
                 operator: str = cast(Token, ast.items[1]).text
                 left = self.make_unbound(cast(ExpressionAST, ast.items[0]))
                 right = self.make_unbound(cast(ExpressionAST, ast.items[2]))
-                return BinaryExpressionNode(operator, left, right)
+                return BinaryExpressionNode.intern(operator, left, right)
 
             case ExpressionASTKind.FUNCTION:
                 func: str = cast(Token, ast.items[0]).text
@@ -315,7 +325,7 @@ class ExpressionParser:
 
                 unbound_args = list(self.make_unbound(arg) for arg in args)
 
-                return FunctionExpressionNode(func, unbound_args)
+                return FunctionExpressionNode.intern(func, unbound_args)
             
     def parse(self) -> UnboundExpression:
         """Parse the parser string and return an unbound arithmetic expression.
@@ -332,3 +342,25 @@ class ExpressionParser:
                 raise SyntaxError(ParserError.UNEXPECTED_TOKEN)
         
         return self.make_unbound(expr)
+
+
+@lru_cache(maxsize=4096)
+def parse_expression(source: str) -> UnboundExpression:
+    """Parse an expression source string and return an unbound arithmetic
+    expression.
+
+    Results are cached by the source string, therefore parsing the same
+    expression repeatedly, for example on each model compilation, does not
+    invoke the lexer and the parser again.
+
+    Constant sub-expressions of the result are folded, see
+    `fold_constants()`.
+
+    .. important::
+
+        The returned expression is shared between the callers and must not be
+        mutated.
+
+    :raises SyntaxError: when the source string is not a valid expression.
+    """
+    return fold_constants(ExpressionParser(source).parse())
@@ -10,7 +10,7 @@ from ..db import ObjectID, MutableFrame
 from ..graph import MutableGraph
 from ..graph import Graph, Node, Edge
 from ..expression import *
-from ..expression.parser import ExpressionParser
+from ..expression.parser import parse_expression
 
 from .issues import CompilerError, NodeIssue
 from .functions import BuiltinFunctions
@@ -130,8 +130,7 @@ class DomainView:
             component = node[ExpressionComponent]
                 
             try:
-                parser = ExpressionParser(component.expression)
-                unbound_expr = parser.parse()
+                unbound_expr = parse_expression(component.expression)
                 bound_expr = bind_expression(unbound_expr,
                                              variables=names,
                                              functions=BuiltinFunctions)
@@ -297,17 +296,20 @@ class Compiler:
         # Finalize and collect issues
 
         # TODO: Test this
-        compiled.stocks = list(node.id for node in sorted_nodes
-                               if node.type is Metamodel.Stock)
-        compiled.flows = list(node.id for node in sorted_nodes
-                               if node.type is Metamodel.Flow)
-        compiled.auxiliaries = list(node.id for node in sorted_nodes
-                               if node.type is Metamodel.Auxiliary)
+        # Node types are projected once, the partitions below only compare
+        # the local values.
+        typed_nodes = [(node.type, node) for node in sorted_nodes]
+        stocks = [node for type, node in typed_nodes
+                  if type is Metamodel.Stock]
+
+        compiled.stocks = [node.id for node in stocks]
+        compiled.flows = [node.id for type, node in typed_nodes
+                          if type is Metamodel.Flow]
+        compiled.auxiliaries = [node.id for type, node in typed_nodes
+                                if type is Metamodel.Auxiliary]
 
         # TODO: Test this
-        for node in sorted_nodes:
-            if node.type is not Metamodel.Stock:
-                continue
+        for node in stocks:
             compiled.stock_components[node.id] = node[StockComponent]
 
         # TODO: Test this
@@ -5,7 +5,9 @@
 # Created by: Stefan Urbanek
 # Date: 2023-04-09
 
-from typing import cast
+from typing import cast, Callable
+from functools import lru_cache
+import math
 from ..db import ObjectID
 
 from ..expression import *
@@ -16,6 +18,8 @@ __all__ = [
         "BoundExpression",
         "bind_expression",
         "evaluate_expression",
+        "ExpressionKernel",
+        "compile_expression",
 ]
 
 VariableReference = ObjectID
@@ -39,6 +43,36 @@ Bound expressions are created by a compiler and used by an experssion
 evaluator, usually called by a solver.
 """
 
+
+def _sum(*args: float) -> float:
+    return float(sum(args))
+
+
+_FUNCTIONS: dict[FunctionReference, Callable[..., float]] = {
+    "abs": abs,
+    "floor": lambda x: float(math.floor(x)),
+    "ceiling": lambda x: float(math.ceil(x)),
+    "round": lambda x: float(round(x)),
+    "power": math.pow,
+    "sqrt": math.sqrt,
+    "sum": _sum,
+    "min": min,
+    "max": max,
+}
+"""Implementations of the built-in functions by their references. See
+`BuiltinFunctions`."""
+
+
+def _function(reference: FunctionReference) -> Callable[..., float]:
+    """Get an implementation of a function.
+
+    :raises RuntimeError: when there is no function with given reference.
+    """
+    try:
+        return _FUNCTIONS[reference]
+    except KeyError:
+        raise RuntimeError(f"Unknown function: {reference}")
+
 def bind_expression(expr: UnboundExpression,
                     variables: dict[str, VariableReference],
                     functions: dict[str, FunctionReference]) -> BoundExpression:
@@ -48,6 +82,9 @@ def bind_expression(expr: UnboundExpression,
     :param variables: Mapping of variable names to variable references.
     :param functions: Mapping of function names to function references.
 
+    Nodes of the bound expression are interned, so structurally identical
+    sub-expressions share one node.
+
     :return: Expression bound to the references.
     :raises: Exception when variable or function is not found.
     """
@@ -61,20 +98,20 @@ def bind_expression(expr: UnboundExpression,
         return cast(BoundExpression, expr)
 
     elif isinstance(expr, UnaryExpressionNode):
-        new = UnaryExpressionNode(operator=functions[expr.operator],
-                                  operand=bind_expression(expr.operand,
-                                                       variables,
-                                                       functions))
+        new = UnaryExpressionNode.intern(functions[expr.operator],
+                                         bind_expression(expr.operand,
+                                                         variables,
+                                                         functions))
         return new
 
     elif isinstance(expr, BinaryExpressionNode):
-        new = BinaryExpressionNode(operator=functions[expr.operator],
-                                  left=bind_expression(expr.left,
-                                                       variables,
-                                                       functions),
-                                  right=bind_expression(expr.right,
-                                                       variables,
-                                                       functions))
+        new = BinaryExpressionNode.intern(functions[expr.operator],
+                                          bind_expression(expr.left,
+                                                          variables,
+                                                          functions),
+                                          bind_expression(expr.right,
+                                                          variables,
+                                                          functions))
         return new
 
     elif isinstance(expr, FunctionExpressionNode):
@@ -83,12 +120,11 @@ def bind_expression(expr: UnboundExpression,
         for arg in expr.args:
             args.append(bind_expression(arg, variables, functions))
 
-        new = FunctionExpressionNode(function=functions[expr.function],
-                                     args=args)
+        new = FunctionExpressionNode.intern(functions[expr.function], args)
         return new
 
     elif isinstance(expr, VariableExpressionNode):
-        new = VariableExpressionNode(variables[expr.variable])
+        new = VariableExpressionNode.intern(variables[expr.variable])
         return new
     else:
         raise RuntimeError(f"Unknown expression node type: {expr}")
@@ -141,7 +177,7 @@ def evaluate_expression(expr: BoundExpression,
             evaluated = evaluate_expression(arg, variables, functions)
             args.append(evaluated)
 
-        raise NotImplementedError
+        return _function(expr.function)(*args)
 
     elif isinstance(expr, VariableExpressionNode):
         return variables[expr.variable]
@@ -150,3 +186,83 @@ def evaluate_expression(expr: BoundExpression,
         raise RuntimeError
 
 
+ExpressionKernel = Callable[[dict[VariableReference, float]], float]
+"""Type of a function that evaluates a compiled bound expression. The
+argument is a mapping of variable references to their values."""
+
+
+def _kernel_source(expr: BoundExpression,
+                   constants: list[float | Callable[..., float]]) -> str:
+    """Get Python source code of the expression for an expression kernel.
+
+    Values and functions are collected into `constants` and referred to by
+    their names ``_c0``, ``_c1``, ... in the returned source. Variables are
+    read from a dictionary named ``v``.
+    """
+    if isinstance(expr, NullExpressionNode):
+        raise RuntimeError
+
+    elif isinstance(expr, ValueExpressionNode):
+        # TODO: value_to_float()
+        name = f"_c{len(constants)}"
+        constants.append(float(expr.value))
+        return name
+
+    elif isinstance(expr, UnaryExpressionNode):
+        operand = _kernel_source(expr.operand, constants)
+        match expr.operator:
+            case "-": return f"(-{operand})"
+            case _: raise RuntimeError
+
+    elif isinstance(expr, BinaryExpressionNode):
+        lhs = _kernel_source(expr.left, constants)
+        rhs = _kernel_source(expr.right, constants)
+        match expr.operator:
+            case "+" | "-" | "*" | "/" | "%":
+                return f"({lhs} {expr.operator} {rhs})"
+            case _: raise RuntimeError
+
+    elif isinstance(expr, FunctionExpressionNode):
+        name = f"_c{len(constants)}"
+        constants.append(_function(expr.function))
+        args = ", ".join(_kernel_source(arg, constants) for arg in expr.args)
+        return f"{name}({args})"
+
+    elif isinstance(expr, VariableExpressionNode):
+        return f"v[{expr.variable!r}]"
+
+    else:
+        raise RuntimeError
+
+
+@lru_cache(maxsize=4096)
+def compile_expression(expr: BoundExpression) -> ExpressionKernel:
+    """
+    Compile a bound expression into a Python function that evaluates the
+    expression.
+
+    The expression tree is converted to Python source code and compiled by
+    the Python compiler once, so the evaluation does not need to walk the
+    expression tree. Kernels are cached by the expression structure,
+    therefore structurally identical expressions share one kernel.
+
+    The kernel produces the same result as `evaluate_expression()`.
+
+    :return: Function that takes a mapping of variable references to values
+        and returns the value of the expression.
+    :raises: Exception when the expression contains an unknown operator or
+        function.
+    """
+    constants: list[float | Callable[..., float]] = list()
+    body = _kernel_source(expr, constants)
+    names = ", ".join(f"_c{i}" for i in range(len(constants)))
+
+    source = f"def make_kernel({names}):\n" \
+             f"    def kernel(v):\n" \
+             f"        return {body}\n" \
+             f"    return kernel\n"
+
+    namespace: dict[str, Callable] = dict()
+    exec(compile(source, "<expression>", "exec"), namespace)
+
+    return namespace["make_kernel"](*constants)
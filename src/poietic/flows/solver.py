@@ -11,7 +11,7 @@ from ..db import ObjectID
 from .compiler import CompiledModel
 from .compiler import BoundExpression
 from .model import StockComponent
-from .evaluate import evaluate_expression
+from .evaluate import compile_expression
 
 from collections.abc import Container
 
@@ -122,9 +122,8 @@ class Solver:
                  time_delta: float = 1.0) ->float:
 
         # TODO: Add time and time_delta
-        return evaluate_expression(expression,
-                                   variables=state.values,
-                                   functions=dict())
+        kernel = compile_expression(expression)
+        return kernel(state.values)
 
     @abstractmethod
     def compute(self,
@@ -6,6 +6,8 @@
 # TODO: IMPORTANT: Graph .node(id) and .edge(id) should raise IdentityError
 
 from typing import Protocol, Iterable, Optional, Self, cast, TYPE_CHECKING, Type
+from typing import Sequence
+from operator import itemgetter
 from abc import abstractmethod
 from enum import Enum, auto
 
@@ -38,19 +40,22 @@ __all__ = [
 # --------------------------------------------------------------------------
 
 class Node(ObjectSnapshot):
-    structural_type_name = "node"
-
     """Structural object type representing nodes in a graph."""
-    pass
+    __slots__ = ()
+
+    structural_type_name = "node"
 
 
 class Edge(ObjectSnapshot):
     """Structural object type representing a directed edge in a graph."""
+    __slots__ = ("origin", "target", "_structural_dependencies")
 
     structural_type_name = "edge"
 
     origin: ObjectID
-    """Origin endpoint (arrow tail) of the directed edge."""
+    """Origin endpoint (arrow tail) of the directed edge. Endpoints are not
+    expected to change after the edge is created, derive a new edge
+    instead."""
     target: ObjectID
     """Target endpoint (arrow head) of the directed edge."""
 
@@ -104,6 +109,7 @@ class Edge(ObjectSnapshot):
                          components=components)
         self.origin = origin
         self.target = target
+        self._structural_dependencies = frozenset((origin, target))
 
 
     def derive(self, snapshot_id: SnapshotID, id: Optional[ObjectID] = None) -> Self:
@@ -117,13 +123,6 @@ class Edge(ObjectSnapshot):
 
         return derived
 
-    def structural_dependencies(self) -> list[ObjectID]:
-        """Return objects that structurally depend on the receiver.
-
-        For example an edge depends on a node that is an endpoint of the edge.
-        """
-        return [self.origin, self.target]
-
 class EdgeDirection(Enum):
     OUTGOING = auto()
     INCOMING = auto()
@@ -182,6 +181,21 @@ class Graph(Protocol):
             raise IDError(id)
 
 
+    def nodes_multi(self, ids: Sequence[ObjectID]) -> list[Node]:
+        """Get a list of nodes with given IDs, in the same order as the
+        IDs."""
+        return [self.node(id) for id in ids]
+
+    def types_of(self, ids: Iterable[ObjectID]) -> list[Optional[ObjectType]]:
+        """Get a list of types of nodes with given IDs, in the same order as
+        the IDs."""
+        return [node.type for node in self.nodes_multi(list(ids))]
+
+    def type_masks_of(self, ids: Iterable[ObjectID]) -> list[int]:
+        """Get a list of type masks of nodes with given IDs, in the same order
+        as the IDs. Nodes without a type have mask 0. See `ObjectType.mask`."""
+        return [t.mask if t is not None else 0 for t in self.types_of(ids)]
+
     def contains_node(self, id: ObjectID) -> bool:
         return any(node.id == id for node in self.nodes())
 
@@ -215,8 +229,16 @@ class Graph(Protocol):
                             node_id=id,
                             edges=filtered_edges)
 
+    def nodes_by_type(self, object_type: ObjectType) -> Iterable[Node]:
+        """Get nodes of type `object_type`."""
+        return (node for node in self.nodes() if node.type is object_type)
+
     def select_nodes(self, predicate: "NodePredicate") -> Iterable[Node]:
-        return (node for node in self.nodes()
+        if (object_type := predicate.required_type()) is not None:
+            nodes = self.nodes_by_type(object_type)
+        else:
+            nodes = self.nodes()
+        return (node for node in nodes
                 if predicate.match_node(self, node))
 
     def select_edges(self, predicate: "EdgePredicate") -> Iterable[Edge]:
@@ -298,11 +320,23 @@ class BoundGraph(Graph):
     _nodes: dict[ObjectID, Node]
     _edges: dict[ObjectID, Edge]
 
+    _type_masks: dict[ObjectID, int]
+    """Type masks of the nodes, looked up in bulk by `type_masks_of()`."""
+
+    _nodes_by_type: dict[Optional[ObjectType], list[Node]]
+
     def __init__(self, frame: FrameBase):
+        self._nodes = dict()
+        self._edges = dict()
+        self._type_masks = dict()
+        self._nodes_by_type = dict()
+
         for obj in frame.snapshots:
             if isinstance(obj, Node):
                 node = cast(Node, obj)
                 self._nodes[node.id] = node
+                self._type_masks[node.id] = node.type.mask if node.type else 0
+                self._nodes_by_type.setdefault(node.type, list()).append(node)
             elif isinstance(obj, Edge):
                 edge = cast(Edge, obj)
                 self._edges[edge.id] = edge
@@ -321,6 +355,23 @@ class BoundGraph(Graph):
     def edge(self, id: ObjectID) -> Edge:
         return self._edges[id]
 
+    def nodes_multi(self, ids: Sequence[ObjectID]) -> list[Node]:
+        # Fetch all the nodes with a single C-level call
+        match len(ids):
+            case 0: return []
+            case 1: return [self._nodes[ids[0]]]
+            case _: return list(itemgetter(*ids)(self._nodes))
+
+    def types_of(self, ids: Iterable[ObjectID]) -> list[Optional[ObjectType]]:
+        return [node.type for node in self.nodes_multi(list(ids))]
+
+    def type_masks_of(self, ids: Iterable[ObjectID]) -> list[int]:
+        # The loop runs in C
+        return list(map(self._type_masks.__getitem__, ids))
+
+    def nodes_by_type(self, object_type: ObjectType) -> Iterable[Node]:
+        return self._nodes_by_type.get(object_type, ())
+
     def contains_node(self, id: ObjectID) -> bool:
         return id in self._nodes
 
@@ -8,12 +8,18 @@
 #
 
 
-from typing import Protocol, Type
+from typing import Protocol, Type, Iterable, Callable, Optional, TYPE_CHECKING
+from weakref import WeakValueDictionary
 
 from .graph import Graph, Node, Edge
 
 from ..db.object import ObjectSnapshot, ObjectType
 from ..db.component import Component
+from ..db.frame import FrameBase
+from ..db.identity import ObjectID
+
+if TYPE_CHECKING:
+    from typing import Self
 
 
 __all__ = [
@@ -22,16 +28,40 @@ __all__ = [
     "ObjectPredicate",
     "AnyPredicate",
     "HasComponentPredicate",
+    "IsTypePredicate",
+    "MatchFunction",
 ]
 
+
+MatchFunction = Callable[[Graph, ObjectSnapshot], bool]
+"""Function that matches an object within a graph. Created by compiling a
+predicate."""
+
+
 class NodePredicate(Protocol):
     def match_node(self, graph: Graph, node: Node) -> bool:
         ...
 
+    def compile_node(self) -> MatchFunction:
+        """Get a function that matches nodes. Default implementation returns
+        `match_node()`."""
+        return self.match_node # type: ignore
+
+    def required_type(self) -> Optional[ObjectType]:
+        """Get the type that all matching objects must be of, or `None` if
+        the predicate does not require a single type. Graphs use the type to
+        select only the nodes of the type before matching."""
+        return None
+
 class EdgePredicate(Protocol):
     def match_edge(self, graph: Graph, edge: Edge) -> bool:
         ...
 
+    def compile_edge(self) -> MatchFunction:
+        """Get a function that matches edges. Default implementation returns
+        `match_edge()`."""
+        return self.match_edge # type: ignore
+
 class ObjectPredicate(NodePredicate, EdgePredicate, Protocol):
     def match_node(self, graph: Graph, node: Node) -> bool:
         return self.match(graph=graph, object=node)
@@ -42,32 +72,119 @@ class ObjectPredicate(NodePredicate, EdgePredicate, Protocol):
     def match(self, graph: Graph, object: ObjectSnapshot) -> bool:
         ...
 
+    def compile(self) -> MatchFunction:
+        """Get a function specialized for the predicate that matches an
+        object the same way as `match()`. The function is used in loops over
+        many objects.
+
+        Default implementation returns `match()`. Subclasses override it with
+        a function bound to the predicate parameters.
+        """
+        return self.match
+
+    def compiled(self) -> MatchFunction:
+        """Get the compiled match function. The predicate is compiled on the
+        first use only."""
+        if (function := getattr(self, "_match_function", None)) is None:
+            function = self.compile()
+            self._match_function = function
+        return function
+
+    def compile_node(self) -> MatchFunction:
+        return self.compiled()
+
+    def compile_edge(self) -> MatchFunction:
+        return self.compiled()
+
+
+_interned_predicates: WeakValueDictionary[tuple, ObjectPredicate] = \
+        WeakValueDictionary()
+"""Table of predicates with the same specification. Predicates created with
+the same specification are the same object and share the compiled match
+function. See `ObjectPredicate.compiled()`.
+
+Interned predicates are initialised in `__new__()` only, their specification
+must not be changed after creation."""
+
 class AnyPredicate(ObjectPredicate):
     def match(self, graph: Graph, object: ObjectSnapshot) -> bool: # pyright: ignore
         return True
 
+    def compile(self) -> MatchFunction:
+        return lambda graph, object: True
+
 
 class HasComponentPredicate(ObjectPredicate):
     component_type: Type[Component] 
 
+    def __new__(cls, component_type: Type[Component]) -> "Self":
+        key = (cls, component_type)
+        if (existing := _interned_predicates.get(key)) is not None:
+            return existing # type: ignore
+        predicate = super().__new__(cls)
+        predicate.component_type = component_type
+        _interned_predicates[key] = predicate
+        return predicate
+
     def __init__(self, component_type: Type[Component]):
-        self.component_type = component_type
+        # Initialised in __new__(), an existing interned predicate must not
+        # be re-initialised.
+        pass
 
     def match(self, graph: Graph, object: ObjectSnapshot) -> bool: # pyright: ignore
-        return object.components.has(self.component_type)
+        return self.component_type in object.components
+
+    def compile(self) -> MatchFunction:
+        component_type = self.component_type
+        return lambda graph, object: \
+                component_type in object.components._components
+
+    def match_all(self, frame: FrameBase) -> Iterable[ObjectID]:
+        """Get IDs of all objects in the frame that match the predicate.
+
+        The frame can use its index of components, which is faster than
+        matching each object."""
+        return frame.objects_with_component(self.component_type)
     
 class IsTypePredicate(ObjectPredicate):
-    object_types: list[ObjectType]
+    object_types: tuple[ObjectType, ...]
 
-    def __init__(self, object_type: ObjectType | list[ObjectType]):
+    def __new__(cls, object_type: ObjectType | list[ObjectType]) -> "Self":
+        object_types: tuple[ObjectType, ...]
         if isinstance(object_type, ObjectType):
-            self.object_types = [object_type]
+            object_types = (object_type, )
         else:
-            self.object_type = object_type
+            object_types = tuple(object_type)
+
+        key = (cls, ) + object_types
+        if (existing := _interned_predicates.get(key)) is not None:
+            return existing # type: ignore
+        predicate = super().__new__(cls)
+        predicate.object_types = object_types
+        _interned_predicates[key] = predicate
+        return predicate
+
+    def __init__(self, object_type: ObjectType | list[ObjectType]):
+        # Initialised in __new__(), an existing interned predicate must not
+        # be re-initialised.
+        pass
 
     def match(self, graph: Graph, object: ObjectSnapshot) -> bool: # pyright: ignore
         return all(object.type is t for t in self.object_types)
 
+    def required_type(self) -> Optional[ObjectType]:
+        if len(self.object_types) == 1:
+            return self.object_types[0]
+        else:
+            return None
+
+    def compile(self) -> MatchFunction:
+        if len(self.object_types) == 1:
+            object_type = self.object_types[0]
+            return lambda graph, object: object.type is object_type
+        else:
+            return self.match
+
 
 # class EdgeEndpointPredicate(EdgePredicate):
 #     """Constraint requirement for edge and its endpoints."""
@@ -60,6 +60,26 @@ class MetamodelBase:
     """
     components: ClassVar[list[Type[Component]]]
 
+    def __init_subclass__(cls, **kwargs):
+        """Assign type bits to the object types declared in the metamodel.
+
+        Bits are numbered from zero within a metamodel, continuing after the
+        bits of the types inherited from the base metamodels, so the masks
+        stay as small as the number of types of the metamodel.
+        """
+        super().__init_subclass__(**kwargs)
+        inherited = [value
+                     for base in cls.__mro__[1:]
+                     for value in base.__dict__.values()
+                     if isinstance(value, ObjectType)]
+        next_bit = max((t.bit for t in inherited), default=-1) + 1
+
+        for value in cls.__dict__.values():
+            if isinstance(value, ObjectType) and value not in inherited:
+                value.bit = next_bit
+                value.mask = 1 << next_bit
+                next_bit += 1
+
     @classmethod
     @cache
     def type_by_name(cls, name: str) -> ObjectType:
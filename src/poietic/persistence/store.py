@@ -7,6 +7,7 @@
 
 
 import json
+from array import array
 from typing import Protocol, Iterable, Any, Optional, Iterator
 from dataclasses import dataclass, field
 from collections.abc import MutableMapping
@@ -24,12 +25,14 @@ __all__ = [
 ]
 
 
-PersistentValue = bool | int | float | str | Point | ObjectID | list[ObjectID]
+PersistentValue = bool | int | float | str | Point | ObjectID | list[ObjectID] \
+                  | array
 """
 Type for values that can be stored in the persistent store.
 
 It consistes of types that conform to the `ValueProtocol` and of an object ID
-or a list of object IDs.
+or a list of object IDs. Large lists of IDs might be provided as packed
+integer arrays, stores treat them as lists.
 
 .. note::
 
@@ -40,7 +43,7 @@ or a list of object IDs.
 """
 
 
-@dataclass
+@dataclass(slots=True)
 class PersistentRecord(MutableMapping):
     """Object for storing key-value pairs that describe an object. 
 
@@ -52,7 +55,8 @@ class PersistentRecord(MutableMapping):
     .. note::
 
         We are wrapping a dictionary so we can have more customization and
-        control.
+        control. Records are created for every snapshot and component, they
+        use slots to avoid an instance dictionary next to the wrapped one.
     """
     _data: dict[str, PersistentValue] = field(default_factory=dict)
 
@@ -85,7 +89,7 @@ class PersistentRecord(MutableMapping):
 """Type representing external records for interchange."""
 
 
-@dataclass
+@dataclass(slots=True)
 class ExtendedPersistentRecord(PersistentRecord):
     """
     Record for persistent object snapshot.
@@ -100,10 +104,12 @@ class ExtendedPersistentRecord(PersistentRecord):
     def __init__(self, primary: Optional[dict[str, PersistentValue]] = None,
                  components: Optional[dict[str, PersistentRecord]] = None):
 
+        # Slotted dataclasses are re-created by the decorator, zero-argument
+        # super() does not work with them.
         if primary is not None:
-            super().__init__(primary)
+            PersistentRecord.__init__(self, primary)
         else:
-            super().__init__()
+            PersistentRecord.__init__(self)
 
         if components is not None:
             self.components = components
@@ -163,6 +169,18 @@ class PersistentStore(Protocol):
     def write_extended_records(self, type_name: str, records: Iterable[ExtendedPersistentRecord]):
         ...
 
+    def write_extended_record_batch(self,
+            batch: Iterable[tuple[str, Iterable[ExtendedPersistentRecord]]]):
+        """Write records of multiple types in a single batch. `batch` is a
+        list of pairs of a type name and records of that type.
+
+        Stores that write to their backend on each call should override
+        this method to combine the writes. The default implementation writes
+        the record types one by one.
+        """
+        for (type_name, records) in batch:
+            self.write_extended_records(type_name, records)
+
     def read_extended_records(self, type_name: str) -> Iterable[ExtendedPersistentRecord]:
         ...
 
@@ -235,7 +253,7 @@ class JSONStore(PersistentStore):
         return collection
 
     def write_extended_records(self, type_name: str,
-                              records: list[ExtendedPersistentRecord]):
+                              records: Iterable[ExtendedPersistentRecord]):
         assert self.is_writing
         """Replace all the records in the container for given type."""
         collection = self._named_collection(type_name)
@@ -290,6 +308,14 @@ class JSONStore(PersistentStore):
     def close(self):
         if self.is_writing:
             with open(self.path, "w") as f:
-                json.dump(self._result, f)
+                json.dump(self._result, f, default=_json_default)
         else:
             pass
+
+
+def _json_default(value: Any) -> Any:
+    """Convert values that are not natively serializable to JSON."""
+    if isinstance(value, array):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} "
+                    "is not JSON serializable")
@@ -9,6 +9,7 @@
 from poietic.db.component import Component
 from poietic.db.object_type import ObjectType
 from poietic.graph import Node, Edge
+from poietic.metamodel import MetamodelBase
 
 class TestComponent(Component):
     text: str
@@ -37,3 +38,14 @@ NodeTypeB = ObjectType(
         structural_type = Node,
         component_types=[
         ])
+
+
+class TestMetamodel(MetamodelBase):
+    components = [
+            TestComponent,
+    ]
+
+    EdgeTypeA = EdgeTypeA
+    EdgeTypeB = EdgeTypeB
+    NodeTypeA = NodeTypeA
+    NodeTypeB = NodeTypeB
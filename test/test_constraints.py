@@ -1,15 +1,23 @@
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 
 from poietic.db import ObjectSnapshot
 from poietic.db.constraints import \
         Constraint, \
+        NodeConstraint, \
         UniqueAttribute, \
         EdgeEndpointType
 
 from poietic.db import ObjectMemory
 from poietic.db.mutable_frame import MutableUnboundGraph
+from poietic.db.object_type import ObjectType
+from poietic.graph import BoundGraph, HasComponentPredicate, IsTypePredicate
+from poietic.graph import Node
+from poietic.metamodel import MetamodelBase
 
-from .common import NodeTypeA, NodeTypeB, EdgeTypeA
+from poietic.attributes import AttributeReference
+
+from .common import NodeTypeA, NodeTypeB, EdgeTypeA, TestComponent
 
 class ConstraintsTestCase(unittest.TestCase):
     graph: MutableUnboundGraph
@@ -19,6 +27,22 @@ class ConstraintsTestCase(unittest.TestCase):
         self.transaction = self.db.derive_frame()
         self.graph = self.transaction.mutable_graph
 
+    def test_object_type_masks(self):
+        masks = [NodeTypeA.mask, NodeTypeB.mask, EdgeTypeA.mask]
+        self.assertEqual(len(set(masks)), 3)
+        self.assertEqual(NodeTypeA.mask, 1 << NodeTypeA.bit)
+        self.assertFalse(NodeTypeA.mask & NodeTypeB.mask)
+
+    def test_object_type_bits_per_metamodel(self):
+        class OtherMetamodel(MetamodelBase):
+            Other = ObjectType(name="Other", structural_type=Node)
+
+        class ExtendedMetamodel(OtherMetamodel):
+            Extra = ObjectType(name="Extra", structural_type=Node)
+
+        self.assertEqual(OtherMetamodel.Other.bit, 0)
+        self.assertEqual(ExtendedMetamodel.Extra.bit, 1)
+
     def test_endpoint_type_requirement(self):
         a = self.graph.create_node(NodeTypeA)
         b = self.graph.create_node(NodeTypeB)
@@ -42,4 +66,97 @@ class ConstraintsTestCase(unittest.TestCase):
                                 target_type=NodeTypeB)
         self.assertEqual(list(o.id for o in req3.check(self.graph, edges)),
                          [edge_aa, edge_ba, edge_bb])
+
+        bound = BoundGraph(self.transaction)
+        self.assertEqual(list(o.id for o in req3.check(bound, edges)),
+                         [edge_aa, edge_ba, edge_bb])
         
+
+    def test_unique_attribute(self):
+        a = self.graph.create_node(NodeTypeA, [TestComponent(text="one")])
+        b = self.graph.create_node(NodeTypeA, [TestComponent(text="two")])
+        c = self.graph.create_node(NodeTypeA, [TestComponent(text="one")])
+        d = self.graph.create_node(NodeTypeA, [TestComponent(text="three")])
+
+        nodes: list[ObjectSnapshot] = list(self.graph.nodes())
+
+        req = UniqueAttribute(AttributeReference(TestComponent, "text"))
+        self.assertEqual(list(o.id for o in req.check(self.graph, nodes)),
+                         [a, c])
+        self.assertEqual(req.check(self.graph, [nodes[1], nodes[3]]), [])
+
+    def test_check_constraint_in_memory(self):
+        a = self.graph.create_node(NodeTypeA, [TestComponent(text="one")])
+        self.graph.create_node(NodeTypeA, [TestComponent(text="two")])
+        c = self.graph.create_node(NodeTypeA, [TestComponent(text="one")])
+        self.db.accept(self.transaction)
+
+        constraint = NodeConstraint(
+                name="unique_text",
+                description="Text must be unique",
+                predicate=HasComponentPredicate(TestComponent),
+                requirement=UniqueAttribute(
+                    AttributeReference(TestComponent, "text")))
+
+        violations = self.db.check_constraints([constraint])
+        self.assertEqual(len(violations), 1)
+        self.assertEqual(violations[0].nodes, [a, c])
+        self.assertEqual(violations[0].edges, [])
+
+        self.assertIs(self.db.check_constraint(constraint), violations[0])
+
+    def test_check_many_constraints(self):
+        a = self.graph.create_node(NodeTypeA, [TestComponent(text="one")])
+        b = self.graph.create_node(NodeTypeA, [TestComponent(text="one")])
+        self.db.accept(self.transaction)
+
+        def unique_text(name: str) -> Constraint:
+            return NodeConstraint(
+                    name=name,
+                    description="Text must be unique",
+                    predicate=HasComponentPredicate(TestComponent),
+                    requirement=UniqueAttribute(
+                        AttributeReference(TestComponent, "text")))
+
+        constraints = [unique_text(f"c{i}") for i in range(6)]
+        violations = self.db.check_constraints(constraints)
+
+        self.assertEqual([v.constraint.name for v in violations],
+                         [c.name for c in constraints])
+        self.assertTrue(all(v.nodes == [a, b] for v in violations))
+
+        # All checks share a graph of the frame
+        graph = self.db._frame_graph(self.db.current_frame)
+        self.assertIs(self.db._frame_graph(self.db.current_frame), graph)
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            parallel = self.db.check_constraints(constraints, executor)
+        self.assertEqual([v.constraint.name for v in parallel],
+                         [c.name for c in constraints])
+
+    def test_type_constraint_uses_type_selection(self):
+        a = self.graph.create_node(NodeTypeA, [TestComponent(text="one")])
+        b = self.graph.create_node(NodeTypeB, [TestComponent(text="one")])
+        c = self.graph.create_node(NodeTypeA, [TestComponent(text="one")])
+
+        bound = BoundGraph(self.transaction)
+        self.assertEqual([n.id for n in bound.nodes_by_type(NodeTypeA)],
+                         [a, c])
+        self.assertEqual([n.id for n in bound.nodes_by_type(EdgeTypeA)], [])
+
+        self.assertEqual([n.id for n in bound.nodes_multi([c, b, a])],
+                         [c, b, a])
+        self.assertEqual([n.id for n in bound.nodes_multi([b])], [b])
+        self.assertEqual(bound.nodes_multi([]), [])
+        self.assertEqual(bound.types_of([a, b]),
+                         self.graph.types_of([a, b]))
+
+        constraint = NodeConstraint(
+                name="unique_text",
+                description="Text must be unique",
+                predicate=IsTypePredicate(NodeTypeA),
+                requirement=UniqueAttribute(
+                    AttributeReference(TestComponent, "text")))
+
+        self.assertEqual([n.id for n in constraint.check(bound)], [a, c])
+        self.assertEqual([n.id for n in constraint.check(self.graph)], [a, c])
@@ -1,14 +1,64 @@
 from poietic.db import ObjectMemory
 from poietic.db import VersionID, VersionState
 from poietic.db import Component
+from poietic.db import ObjectSnapshot
+from poietic.db.identity import SequentialIDGenerator
+from poietic.db.frame import StableFrame
+from poietic.db.mutable_frame import MutableFrame
+from poietic.errors import IDError
+
+from .common import NodeTypeA, EdgeTypeA
 
 import unittest
+from threading import Thread
 
 class TestComponent(Component):
     text: str
     def __init__(self, text: str):
         self.text = text
 
+class TestSequentialIDGenerator(unittest.TestCase):
+    def test_next(self):
+        gen = SequentialIDGenerator()
+        self.assertEqual([gen.next(), gen.next(), gen.next()], [1, 2, 3])
+
+    def test_state(self):
+        gen = SequentialIDGenerator(state="10")
+        self.assertEqual(gen.state, "10")
+        self.assertEqual(gen.next(), 10)
+        self.assertEqual(gen.state, "11")
+
+    def test_mark_used(self):
+        gen = SequentialIDGenerator()
+        gen.mark_used(5)
+        self.assertEqual(gen.next(), 6)
+        # Does not go back
+        gen.mark_used(2)
+        self.assertEqual(gen.next(), 7)
+
+    def test_state_has_no_side_effect(self):
+        gen = SequentialIDGenerator()
+        gen.next()
+        self.assertEqual(gen.state, "2")
+        self.assertEqual(gen.state, "2")
+        self.assertEqual(gen.next(), 2)
+
+    def test_concurrent_next(self):
+        gen = SequentialIDGenerator()
+        ids: list[int] = list()
+
+        def draw():
+            ids.extend([gen.next() for _ in range(1000)])
+
+        threads = [Thread(target=draw) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(ids), list(range(1, 4001)))
+
+
 class TestDatabase(unittest.TestCase):
     def test_empty(self):
         # test_ that empty trans does not result in a version change
@@ -66,6 +116,140 @@ class TestDatabase(unittest.TestCase):
         self.assertEqual(len(db.version_history), 1)
     
 
+    def test_accept_missing_dependency(self):
+        db = ObjectMemory()
+        trans = db.derive_frame()
+        graph = trans.mutable_graph
+
+        a = graph.create_node(NodeTypeA)
+        b = graph.create_node(NodeTypeA)
+        graph.create_edge(EdgeTypeA, a, b)
+        # Remove without removing the dependants
+        trans._remove(b)
+
+        self.assertNotIn(b, trans.object_ids)
+        with self.assertRaises(RuntimeError):
+            db.accept(trans)
+
+    def test_accept_removed_dependency_of_original(self):
+        db = ObjectMemory()
+        trans = db.derive_frame()
+        graph = trans.mutable_graph
+        a = graph.create_node(NodeTypeA)
+        b = graph.create_node(NodeTypeA)
+        graph.create_edge(EdgeTypeA, a, b)
+        db.accept(trans)
+
+        trans = db.derive_frame()
+        # The edge is not changed in this frame
+        trans._remove(b)
+        self.assertIsNotNone(trans.integrity_violation())
+        with self.assertRaises(RuntimeError):
+            db.accept(trans)
+
+    def test_remove_from_derived_frame(self):
+        db = ObjectMemory()
+        trans = db.derive_frame()
+        a = trans.create_object()
+        db.accept(trans)
+
+        trans = db.derive_frame()
+        b = trans.create_object()
+        trans._remove(a)
+        trans._remove(b)
+        self.assertFalse(trans.contains(a))
+        self.assertFalse(trans.contains(b))
+        self.assertEqual(len(trans.object_ids), 0)
+
+        with self.assertRaises(IDError):
+            trans._remove(a)
+        with self.assertRaises(IDError):
+            trans.remove_cascading(a)
+
+    def test_derived_frame_snapshots_view(self):
+        db = ObjectMemory()
+        trans = db.derive_frame()
+        a = trans.create_object()
+        b = trans.create_object()
+        db.accept(trans)
+
+        trans = db.derive_frame()
+        snapshots = trans.snapshots
+        self.assertEqual([obj.id for obj in snapshots], [a, b])
+
+        c = trans.create_object()
+        derived = trans.mutable_object(b)
+        trans._remove(a)
+        self.assertEqual(len(snapshots), 2)
+        self.assertEqual([obj.id for obj in snapshots], [b, c])
+        self.assertIn(derived, snapshots)
+        self.assertEqual(list(snapshots), list(trans._snapshots.flatten().values()))
+
+    def test_remove_cascading_in_frame_with_objects(self):
+        db = ObjectMemory()
+        trans = db.derive_frame()
+        graph = trans.mutable_graph
+        a = graph.create_node(NodeTypeA)
+        b = graph.create_node(NodeTypeA)
+        edge = graph.create_edge(EdgeTypeA, a, b)
+        db.accept(trans)
+
+        frame = MutableFrame(memory=db,
+                             version=999,
+                             objects=iter(db.current_frame.snapshots))
+        self.assertEqual(frame.structural_dependants(a), [edge])
+
+        removed = frame.remove_cascading(a)
+        self.assertEqual(removed, [edge])
+        self.assertFalse(frame.contains(edge))
+        self.assertIsNone(frame.integrity_violation())
+
+        frame = MutableFrame(memory=db,
+                             version=1000,
+                             objects=iter(db.current_frame.snapshots))
+        frame._remove(b)
+        self.assertEqual(frame.integrity_violation(), (edge, b))
+
+    def test_remove_cascading_in_derived_frame(self):
+        db = ObjectMemory()
+        trans = db.derive_frame()
+        graph = trans.mutable_graph
+        a = graph.create_node(NodeTypeA)
+        b = graph.create_node(NodeTypeA)
+        c = graph.create_node(NodeTypeA)
+        ab = graph.create_edge(EdgeTypeA, a, b)
+        bc = graph.create_edge(EdgeTypeA, b, c)
+        db.accept(trans)
+
+        trans = db.derive_frame()
+        graph = trans.mutable_graph
+        ca = graph.create_edge(EdgeTypeA, c, a)
+        cb = graph.create_edge(EdgeTypeA, c, b)
+
+        self.assertEqual(sorted(trans.structural_dependants(b)),
+                         sorted([ab, bc, cb]))
+        self.assertEqual(sorted(db.current_frame.structural_dependants(b)),
+                         sorted([ab, bc]))
+
+        removed = trans.remove_cascading(b)
+        self.assertEqual(sorted(removed), sorted([ab, bc, cb]))
+        self.assertEqual(trans.structural_dependants(a), [ca])
+        self.assertIsNone(trans.integrity_violation())
+        db.accept(trans)
+
+        self.assertEqual(set(db.current_frame.object_ids), {a, c, ca})
+
+    def test_referential_integrity(self):
+        db = ObjectMemory()
+        trans = db.derive_frame()
+        graph = trans.mutable_graph
+        a = graph.create_node(NodeTypeA)
+        b = graph.create_node(NodeTypeA)
+        graph.create_edge(EdgeTypeA, a, b)
+
+        self.assertIsNone(trans.integrity_violation())
+        self.assertTrue(trans.has_referential_integrity())
+
     def test_remove_object(self):
         db = ObjectMemory()
         originalTrans = db.derive_frame()
@@ -117,7 +301,195 @@ class TestDatabase(unittest.TestCase):
         
         self.assertEqual("hello", originalNodeAgain[TestComponent].text)
 
-    
+    def test_contains_version(self):
+        db = ObjectMemory()
+        accepted = db.derive_frame()
+        discarded = db.derive_frame()
+        removed = db.derive_frame()
+        self.assertTrue(db.contains_version(accepted.version))
+        self.assertTrue(db.contains_version(discarded.version))
+
+        db.accept(accepted)
+        db.discard(discarded)
+        db.remove_frame(removed.version)
+
+        self.assertTrue(db.contains_version(accepted.version))
+        self.assertFalse(db.contains_version(discarded.version))
+        self.assertFalse(db.contains_version(removed.version))
+
+    def test_current_frame_follows_history(self):
+        db = ObjectMemory()
+        v0 = db.current_version
+        frame0 = db.current_frame
+        self.assertIs(db.current_frame, frame0)
+
+        trans = db.derive_frame()
+        db.accept(trans)
+        self.assertEqual(db.current_version, trans.version)
+        self.assertIs(db.current_frame, db.frame(trans.version))
+
+        db.undo(v0)
+        self.assertEqual(db.current_version, v0)
+        self.assertIs(db.current_frame, frame0)
+
+        db.redo(trans.version)
+        self.assertEqual(db.current_version, trans.version)
+
+    def test_accept_unchanged_frame_shares_snapshots(self):
+        db = ObjectMemory()
+        trans = db.derive_frame()
+        a = trans.create_object()
+        db.accept(trans)
+        original = db.current_frame
+
+        trans = db.derive_frame()
+        db.accept(trans)
+
+        self.assertIs(db.current_frame._snapshots, original._snapshots)
+        self.assertTrue(db.current_frame.contains(a))
+
+    def test_accept_unowned_mutable_snapshot(self):
+        db = ObjectMemory()
+        trans = db.derive_frame()
+        trans.create_object()
+        db.accept(trans)
+
+        trans = db.derive_frame()
+        snapshot = ObjectSnapshot(id=db.identity_generator.next(),
+                                  snapshot_id=db.identity_generator.next())
+        trans.insert(snapshot, owned=False)
+        self.assertTrue(snapshot.state.is_mutable)
+
+        with self.assertRaises(RuntimeError):
+            db.accept(trans)
+        self.assertNotEqual(db.current_version, trans.version)
+
+    def test_stable_frame_from_objects(self):
+        db = ObjectMemory()
+        trans = db.derive_frame()
+        a = trans.create_object()
+        db.accept(trans)
+
+        frame = StableFrame(version=100,
+                            objects=iter(db.current_frame.snapshots))
+        self.assertTrue(frame.contains(a))
+
+        trans = db.derive_frame()
+        unstable = trans.create_object()
+        with self.assertRaises(RuntimeError):
+            StableFrame(version=101, objects=iter([trans.object(unstable)]))
+
+    def test_stable_frame_integrity_violators(self):
+        db = ObjectMemory()
+        trans = db.derive_frame()
+        graph = trans.mutable_graph
+        a = graph.create_node(NodeTypeA)
+        b = graph.create_node(NodeTypeA)
+        edge = graph.create_edge(EdgeTypeA, a, b)
+        db.accept(trans)
+        self.assertTrue(db.current_frame.has_referential_integrity())
+
+        objects = (obj for obj in db.current_frame.snapshots if obj.id != b)
+        frame = StableFrame(version=100, objects=objects)
+        self.assertFalse(frame.has_referential_integrity())
+        self.assertEqual(list(frame.referential_integrity_violators()),
+                         [edge])
+
+    def test_snapshots(self):
+        db = ObjectMemory()
+        trans = db.derive_frame()
+        a = trans.create_object(components=[TestComponent(text="old")])
+        b = trans.create_object()
+        db.accept(trans)
+        v1 = db.current_version
+
+        trans = db.derive_frame()
+        trans.set_component(a, TestComponent(text="new"))
+        db.accept(trans)
+
+        # Two snapshots of a, one snapshot of b shared by both frames
+        snapshots = list(db.snapshots)
+        self.assertEqual(len(snapshots), 3)
+        self.assertEqual(sorted(s.id for s in snapshots), sorted([a, a, b]))
+
+        db.remove_frame(v1)
+        snapshots = list(db.snapshots)
+        self.assertEqual(len(snapshots), 2)
+        self.assertEqual(db.current_frame.object(a).snapshot_id,
+                         [s for s in snapshots if s.id == a][0].snapshot_id)
+
+    def test_release_snapshots(self):
+        db = ObjectMemory()
+        v0 = db.current_version
+        trans = db.derive_frame()
+        trans.create_object()
+        db.accept(trans)
+
+        discarded = db.derive_frame()
+        discarded.create_object()
+        db.discard(discarded)
+        self.assertEqual(len(db.snapshots), 1)
+
+        db.undo(v0)
+        trans = db.derive_frame()
+        db.accept(trans)
+
+        # The undone frame was dropped together with its snapshot
+        self.assertEqual(len(db.snapshots), 0)
+        self.assertEqual(db._snapshot_refcount, {})
+
+    def test_object_versions(self):
+        db = ObjectMemory()
+        trans = db.derive_frame()
+        a = trans.create_object()
+        db.accept(trans)
+        v1 = db.current_version
+
+        trans = db.derive_frame()
+        b = trans.create_object()
+        db.accept(trans)
+        v2 = db.current_version
+
+        self.assertEqual(db.versions(a), [v1, v2])
+        self.assertEqual(db.versions(b), [v2])
+
+        db.remove_frame(v1)
+        self.assertEqual(db.versions(a), [v2])
+
+        db.remove_frame(v2)
+        self.assertEqual(db.versions(a), [])
+        self.assertEqual(db.versions(b), [])
+
+    def test_derived_frame_shares_snapshots(self):
+        db = ObjectMemory()
+        trans = db.derive_frame()
+        a = trans.create_object(components=[TestComponent(text="a")])
+        b = trans.create_object(components=[TestComponent(text="b")])
+        c = trans.create_object(components=[TestComponent(text="c")])
+        db.accept(trans)
+        original = db.current_frame
+
+        derived = db.derive_frame()
+        self.assertIs(derived._snapshots.parent, original._snapshots)
+        self.assertEqual(len(derived._snapshots.overlay), 0)
+
+        derived.set_component(b, TestComponent(text="changed"))
+        derived.remove_cascading(c)
+        d = derived.create_object()
+
+        self.assertEqual(list(derived.object_ids), [a, b, d])
+        self.assertFalse(derived.contains(c))
+        self.assertEqual(set(original.object_ids), {a, b, c})
+        self.assertEqual(original.object(b)[TestComponent].text, "b")
+        self.assertIs(derived.object(a), original.object(a))
+
+        db.accept(derived)
+        frame = db.current_frame
+
+        self.assertEqual(list(frame.object_ids), [a, b, d])
+        self.assertEqual(frame.object(b)[TestComponent].text, "changed")
+        self.assertEqual(frame.object(b).state, VersionState.FROZEN)
+
     def test_undo(self):
         db = ObjectMemory()
         v0 = db.current_version
@@ -245,3 +617,43 @@ class TestDatabase(unittest.TestCase):
 
         self.assertFalse(db.current_frame.contains(a))
         self.assertTrue(db.current_frame.contains(b))
+
+        # Version v1 was removed from the history
+        with self.assertRaises(RuntimeError):
+            db.redo(trans1.version)
+
+        # ... together with its frame
+        self.assertFalse(db.contains_version(trans1.version))
+        self.assertEqual(db.versions(a), [])
+
+        db.undo(v0)
+        db.redo(v2)
+        self.assertEqual(db.current_version, v2)
+
+    def test_history_positions_after_trim(self):
+        db = ObjectMemory()
+        versions = [db.current_version]
+
+        for i in range(10):
+            trans = db.derive_frame()
+            trans.create_object()
+            db.accept(trans)
+            versions.append(trans.version)
+
+        db.undo(versions[4])
+        self.assertEqual(db.current_version, versions[4])
+        db.redo(versions[8])
+        self.assertEqual(db.current_version, versions[8])
+        db.undo(versions[3])
+
+        trans = db.derive_frame()
+        db.accept(trans)
+
+        self.assertEqual(db.version_history, versions[:4] + [trans.version])
+        for version in versions[4:]:
+            with self.assertRaises(RuntimeError):
+                db.redo(version)
+
+        db.undo(versions[1])
+        db.redo(trans.version)
+        self.assertEqual(db.current_version, trans.version)
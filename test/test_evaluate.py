@@ -2,6 +2,8 @@ import unittest
 
 from poietic.expression.parser import ExpressionParser
 from poietic.flows.evaluate import bind_expression, evaluate_expression
+from poietic.flows.evaluate import compile_expression
+from poietic.flows.functions import BuiltinFunctions
 
 class EvaluationTestCase(unittest.TestCase):
     def test_evaluateLiteral(self):
@@ -26,3 +28,51 @@ class EvaluationTestCase(unittest.TestCase):
 
         self.assertEqual(value, 110.0)
 
+    def test_compiledMatchesEvaluated(self):
+        uexpr = ExpressionParser("-x * (y + 2.5) / 4 % 3 - 1").parse()
+        expr = bind_expression(uexpr,
+                               variables={"x":1, "y":2},
+                               functions={"+":"+", "-":"-", "*":"*",
+                                          "/":"/", "%":"%"})
+        variables = {1: 10.0, 2: 100.0}
+
+        kernel = compile_expression(expr)
+
+        self.assertEqual(kernel(variables),
+                         evaluate_expression(expr, variables=variables,
+                                             functions={}))
+        self.assertIs(kernel, compile_expression(expr))
+
+    def test_evaluateFunction(self):
+        uexpr = ExpressionParser("max(x, 2) + sqrt(y) - floor(2.5)").parse()
+        expr = bind_expression(uexpr,
+                               variables={"x":1, "y":2},
+                               functions=BuiltinFunctions)
+        variables = {1: 10.0, 2: 100.0}
+
+        value = evaluate_expression(expr, variables=variables, functions={})
+        self.assertEqual(value, 18.0)
+        self.assertEqual(compile_expression(expr)(variables), value)
+
+    def test_evaluateUnknownFunction(self):
+        uexpr = ExpressionParser("nothing(x)").parse()
+        expr = bind_expression(uexpr,
+                               variables={"x":1},
+                               functions={"nothing": "nothing"})
+
+        with self.assertRaises(RuntimeError):
+            evaluate_expression(expr, variables={1: 1.0}, functions={})
+        with self.assertRaises(RuntimeError):
+            compile_expression(expr)
+
+    def test_bindSharedSubexpressions(self):
+        uexpr = ExpressionParser("(x + y) * (x + y) - -x").parse()
+        expr = bind_expression(uexpr,
+                               variables={"x":1, "y":2},
+                               functions={"+":"+", "-":"-", "*":"*"})
+
+        self.assertIs(expr.left.left, expr.left.right)
+        self.assertEqual(evaluate_expression(expr,
+                                             variables={1: 10.0, 2: 100.0},
+                                             functions={}),
+                         12110.0)
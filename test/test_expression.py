@@ -2,6 +2,11 @@ import unittest
 
 # from poietic.flows.expression import UnboundExpression
 from poietic.expression.parser import ExpressionParser
+from poietic.expression.optimize import fold_constants
+from poietic.expression import \
+        ValueExpressionNode, \
+        VariableExpressionNode, \
+        BinaryExpressionNode
 
 class TestExpression(unittest.TestCase):
     def test_variables(self):
@@ -26,3 +31,46 @@ class TestExpression(unittest.TestCase):
 
         
 
+
+    def test_interned_subexpressions_are_shared(self):
+        expr = ExpressionParser("min(a + b, a + b) + 1.0").parse()
+
+        left = expr.left
+        self.assertIs(left.args[0], left.args[1])
+        self.assertIs(ExpressionParser("a + b").parse(), left.args[0])
+
+    def test_interned_values_keep_type(self):
+        int_expr = ExpressionParser("1").parse()
+        float_expr = ExpressionParser("1.0").parse()
+
+        self.assertIsInstance(int_expr.value, int)
+        self.assertIsInstance(float_expr.value, float)
+
+    def test_kind_is_class_variable(self):
+        expr = ExpressionParser("-min(a, 1) + b").parse()
+
+        for node in (expr, expr.left, expr.left.operand, expr.right):
+            self.assertFalse(hasattr(node, "__dict__"))
+            self.assertIs(node.kind, type(node).kind)
+
+    def test_fold_constants(self):
+        expr = fold_constants(ExpressionParser("2 * 3 + x * -(1 + 1)").parse())
+        expected = BinaryExpressionNode(
+            "+",
+            ValueExpressionNode(6.0),
+            BinaryExpressionNode("*",
+                                 VariableExpressionNode("x"),
+                                 ValueExpressionNode(-2.0))
+        )
+        self.assertEqual(expr, expected)
+        self.assertIsInstance(expr.left.value, float)
+
+    def test_fold_constants_only_bound_operators(self):
+        # Modulo is bound to a different function, it is left for the
+        # evaluation.
+        original = ExpressionParser("5 % 3").parse()
+        self.assertIs(fold_constants(original), original)
+
+    def test_fold_constants_keeps_invalid_operations(self):
+        original = ExpressionParser("1 / 0 + x").parse()
+        self.assertIs(fold_constants(original), original)
@@ -1,7 +1,9 @@
 import unittest
 
 from poietic.expression.parser import Lexer, TokenType, ParserError
+from poietic.expression.lexer import tokenize
 from poietic.expression.parser import ExpressionParser, SyntaxError
+from poietic.expression.parser import parse_expression
 from poietic.expression import \
         ValueExpressionNode, \
         VariableExpressionNode, \
@@ -98,6 +100,21 @@ class TestLexer(unittest.TestCase):
         token = lexer.next()
         self.assertEqual(token.token_type, TokenType.IDENTIFIER)
         self.assertEqual(token.text, "an_identifier_1")
+
+    def test_UnderscoreIdentifier(self):
+        lexer = Lexer("_private2 + x")
+        token = lexer.next()
+        self.assertEqual(token.token_type, TokenType.IDENTIFIER)
+        self.assertEqual(token.text, "_private2")
+
+        lexer = Lexer("_a1_b c")
+        result = lexer.accept_identifier()
+        self.assertEqual(result.value, TokenType.IDENTIFIER)
+        self.assertEqual(lexer.current_index, 5)
+
+        lexer = Lexer("1a")
+        self.assertIsNone(lexer.accept_identifier())
+        self.assertEqual(lexer.current_index, 0)
     
 
     def test_Punctuation(self):
@@ -156,6 +173,54 @@ class TestLexer(unittest.TestCase):
 
         # TODO: Test trivia.
 
+    def test_TokenizeMatchesLexer(self):
+        source = " fun(a_1, 10.5e-3) *\n -x % 12y $ 3."
+        lexer = Lexer(source)
+        tokens = tokenize(source)
+
+        for token in tokens:
+            expected = lexer.next()
+            self.assertEqual(token.token_type, expected.token_type)
+            self.assertEqual(token.text, expected.text)
+            self.assertEqual(token.error, expected.error)
+            self.assertEqual(str(token.location), str(expected.location))
+
+        self.assertEqual(tokens[-1].token_type, TokenType.EMPTY)
+
+    def test_AcceptNumber(self):
+        cases = [("1_000 ", TokenType.INT, 5),
+                 ("12.5e-3_0+", TokenType.FLOAT, 9),
+                 ("3.x", ParserError.INVALID_CHAR_IN_NUMBER, 2),
+                 ("10a", ParserError.INVALID_CHAR_IN_NUMBER, 3)]
+
+        for source, expected, end in cases:
+            lexer = Lexer(source)
+            result = lexer.accept_number()
+            self.assertEqual(result.value or result.error, expected)
+            self.assertEqual(lexer.current_index, end)
+            self.assertEqual(lexer.current_char, source[end:end+1] or None)
+
+    def test_LocationAfterAccept(self):
+        lexer = Lexer("a\n bc")
+        lexer.accept()
+        self.assertEqual(str(lexer.location), "1:2")
+        lexer.accept()
+        lexer.accept()
+        self.assertEqual(str(lexer.location), "2:2")
+
+        self.assertEqual(str(lexer.next().location), "2:2")
+        self.assertEqual(str(lexer.location), "2:4")
+
+    def test_IdentifiersAreInterned(self):
+        source = "".join(["rate", "_of", " * rate_of"])
+        tokens = tokenize(source)
+        self.assertIs(tokens[0].text, tokens[2].text)
+
+        lexer = Lexer(source)
+        first = lexer.next()
+        lexer.next()
+        self.assertIs(first.text, lexer.next().text)
+
 class TestParser(unittest.TestCase):
     def testEmpty(self):
         parser = ExpressionParser("")
@@ -287,6 +352,16 @@ class TestParser(unittest.TestCase):
             parser.parse()
     
     
+    def testCachedParse(self):
+        expr = BinaryExpressionNode("+",
+                                    VariableExpressionNode("a"),
+                                    ValueExpressionNode(1))
+        self.assertEqual(parse_expression("a + 1"), expr)
+        self.assertIs(parse_expression("a + 1"), parse_expression("a + 1"))
+
+        with self.assertRaisesRegex(SyntaxError, "Unexpected token"):
+            parse_expression("1 1")
+
     # TODO: This works when we have trivia parsing
 
     # def testFullText(self):
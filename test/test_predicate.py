@@ -15,7 +15,8 @@ from poietic.db import MutableUnboundGraph
 from poietic.db import Component
 from poietic.db import ObjectSnapshot
 from poietic.db import MutableFrame
-from poietic.graph import HasComponentPredicate
+from poietic.graph import HasComponentPredicate, IsTypePredicate
+from poietic.graph import AnyPredicate
 
 
 class TestComponent(Component):
@@ -43,6 +44,64 @@ class TestPredicate(unittest.TestCase):
         self.assertTrue(pred.match(graph, obj_yes))
         self.assertFalse(pred.match(graph, obj_no))
 
+    def test_compiled_predicates(self):
+        frame = MutableFrame(ObjectMemory(), 0)
+        graph = frame.mutable_graph
+
+        obj_yes = ObjectSnapshot(id=1,
+                                 snapshot_id=1,
+                                 components=[TestComponent(text="test")])
+        obj_yes.type = Metamodel.Auxiliary
+        obj_no = ObjectSnapshot(id=2,
+                                snapshot_id=2)
+
+        predicates = [HasComponentPredicate(TestComponent),
+                      IsTypePredicate(Metamodel.Auxiliary),
+                      IsTypePredicate([Metamodel.Auxiliary]),
+                      AnyPredicate()]
+
+        for pred in predicates:
+            match = pred.compile()
+            for obj in [obj_yes, obj_no]:
+                self.assertEqual(match(graph, obj), pred.match(graph, obj))
+
+    def test_interned_predicates(self):
+        self.assertIs(HasComponentPredicate(TestComponent),
+                      HasComponentPredicate(TestComponent))
+        self.assertIsNot(HasComponentPredicate(TestComponent),
+                         HasComponentPredicate(ExpressionComponent))
+        self.assertIs(IsTypePredicate(Metamodel.Auxiliary),
+                      IsTypePredicate([Metamodel.Auxiliary]))
+
+        pred = IsTypePredicate(Metamodel.Auxiliary)
+        self.assertIs(pred.compile_node(),
+                      IsTypePredicate(Metamodel.Auxiliary).compile_node())
+
+    def test_interned_predicate_specification_is_immutable(self):
+        types = [Metamodel.Auxiliary, Metamodel.Stock]
+        pred = IsTypePredicate(types)
+        types.append(Metamodel.Flow)
+        self.assertEqual(pred.object_types,
+                         (Metamodel.Auxiliary, Metamodel.Stock))
+
+        # Constructing the predicate again does not re-initialise it
+        self.assertIs(IsTypePredicate([Metamodel.Auxiliary, Metamodel.Stock]),
+                      pred)
+        self.assertEqual(pred.object_types,
+                         (Metamodel.Auxiliary, Metamodel.Stock))
+
+    def test_component_access(self):
+        obj = ObjectSnapshot(id=1,
+                             snapshot_id=1,
+                             components=[TestComponent(text="test")])
+
+        self.assertIn(TestComponent, obj.components)
+        self.assertEqual(obj.components[TestComponent].text, "test")
+        self.assertIs(obj[TestComponent], obj.components.get(TestComponent))
+
+        with self.assertRaises(KeyError):
+            obj[ExpressionComponent]
+
 
 class TestGraphQuery(unittest.TestCase):
     db: ObjectMemory
@@ -64,3 +123,38 @@ class TestGraphQuery(unittest.TestCase):
         self.assertEqual(nodes[0].id, node_id)
         self.assertIs(nodes[0], self.graph.node(node_id))
 
+
+    def test_selectNodesIndexIsUpdated(self):
+        pred = HasComponentPredicate(TestComponent)
+        node_id = self.graph.create_node(Metamodel.Auxiliary,
+                              [ExpressionComponent(name="c",expression="0")])
+
+        self.assertEqual(list(self.graph.select_nodes(pred)), [])
+
+        self.trans.set_component(node_id, TestComponent(text="test"))
+        nodes = list(self.graph.select_nodes(pred))
+        self.assertEqual([node.id for node in nodes], [node_id])
+
+        self.graph.remove_node(node_id)
+        self.assertEqual(list(self.graph.select_nodes(pred)), [])
+
+    def test_selectNodesReflectsMutableObjectChanges(self):
+        pred = HasComponentPredicate(TestComponent)
+        node_id = self.graph.create_node(Metamodel.Auxiliary,
+                              [ExpressionComponent(name="c",expression="0")])
+        self.db.accept(self.trans)
+
+        trans = self.db.derive_frame()
+        graph = MutableUnboundGraph(trans)
+        self.assertEqual(list(graph.select_nodes(pred)), [])
+
+        obj = trans.mutable_object(node_id)
+        self.assertEqual(list(graph.select_nodes(pred)), [])
+
+        obj.components.set(TestComponent(text="test"))
+        self.assertTrue(pred.match(trans, obj))
+        nodes = list(graph.select_nodes(pred))
+        self.assertEqual([node.id for node in nodes], [node_id])
+
+        obj.components.remove(TestComponent)
+        self.assertEqual(list(graph.select_nodes(pred)), [])